@@ -1,5 +1,6 @@
 import os
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
 from typing import List
 from pydantic import BaseModel
 import shutil
@@ -12,6 +13,9 @@ from langchain.embeddings import OllamaEmbeddings
 
 app = FastAPI(title="PDF Query API with Ollama", version="1.0.0")
 
+# Compress larger answers on the wire; small ones aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Configuration
 EMBEDDING_MODEL_NAME = "nomic-embed-text"  # Ollama embedding model
 LLM_MODEL_NAME = "gemma:2b"  # Local Llama model via Ollama
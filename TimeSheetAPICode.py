@@ -35,6 +35,7 @@ import dateparser
 import ollama
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel, Field, validator
 from contextlib import asynccontextmanager
 import uvicorn
@@ -1710,6 +1711,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger replies (tabular timesheet data) on the wire; small ones aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Initialize the ultimate controller
 ultimate_controller = UltimateChatbotController()
 
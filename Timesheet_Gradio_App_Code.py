@@ -7,16 +7,44 @@ FIXED: Datetime object interpretation errors and Gradio compatibility issues
 
 import gradio as gr
 import requests
+import urllib3
 import json
-import pandas as pd
+from collections import deque
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Optional
 import time
-import asyncio
 
 # Configuration
 API_BASE_URL = "http://localhost:8000"
 DEFAULT_EMAIL = "demo.user@company.com"
+DATE_FORMAT = "%Y-%m-%d"
+STATIC_DIR = Path(__file__).parent
+
+# Cached "today" string and the epoch second at which it goes stale (next local midnight)
+_today_cache = [0.0, ""]
+
+def today_str() -> str:
+    """Return today's date as YYYY-MM-DD, recomputed only once per local day"""
+    now = time.time()
+    if now >= _today_cache[0]:
+        today = date.today()
+        next_midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        _today_cache[0] = next_midnight.timestamp()
+        _today_cache[1] = today.strftime(DATE_FORMAT)
+    return _today_cache[1]
+
+@lru_cache(maxsize=None)
+def load_static_text(filename: str) -> str:
+    """Read a static help/examples file next to this module once per process"""
+    return STATIC_DIR.joinpath(filename).read_text(encoding="utf-8")
+
+def _pd():
+    """Import pandas on first use; only the DataFrame download builders need it"""
+    import pandas
+    return pandas
 
 class UltimateTimesheetClient:
     """Professional client for Ultimate Timesheet API - Fixed Version"""
@@ -26,26 +54,36 @@ class UltimateTimesheetClient:
         self.session = requests.Session()
         self.session.headers.update({"Content-Type": "application/json"})
 
+        # Hot chat path goes straight to urllib3 to skip the requests wrapper overhead
+        self.chat_url = f"{base_url}/chat"
+        self.pool = urllib3.PoolManager(
+            num_pools=4,
+            maxsize=32,
+            headers={"Content-Type": "application/json"},
+            timeout=urllib3.Timeout(total=30),
+            retries=False
+        )
+
     def chat(self, email: str, user_prompt: str) -> Dict:
         """Send chat message to API"""
         try:
-            response = self.session.post(
-                f"{self.base_url}/chat",
-                json={"email": email, "user_prompt": user_prompt},
-                timeout=30
+            response = self.pool.request(
+                "POST",
+                self.chat_url,
+                body=json.dumps({"email": email, "user_prompt": user_prompt}).encode("utf-8")
             )
 
-            if response.status_code == 200:
-                return response.json()
+            if response.status == 200:
+                return json.loads(response.data)
             else:
                 return {
-                    "response": f"❌ API Error: {response.status_code}\n{response.text}",
+                    "response": f"❌ API Error: {response.status}\n{response.data.decode('utf-8', 'replace')}",
                     "conversation_phase": "error",
                     "tabular_data": None,
                     "suggestions": ["Try again", "Check API status"]
                 }
 
-        except requests.exceptions.ConnectionError:
+        except (urllib3.exceptions.NewConnectionError, urllib3.exceptions.MaxRetryError):
             return {
                 "response": "❌ Cannot connect to the Ultimate Timesheet API.\n\n"
                           "Please ensure the API server is running at http://localhost:8000\n\n"
@@ -128,16 +166,18 @@ class UltimateTimesheetClient:
     def get_timesheet(self, email: str, system: str, start_date: str = None, end_date: str = None) -> Dict:
         """Get user timesheet"""
         try:
-            params = {}
-            if start_date:
-                params['start_date'] = start_date
-            if end_date:
-                params['end_date'] = end_date
-
-            response = self.session.get(
-                f"{self.base_url}/timesheet/{email}/{system}",
-                params=params
+            # Only the truthy date filters become query pairs; skip params entirely when none
+            params = tuple(
+                (key, value)
+                for key, value in (("start_date", start_date), ("end_date", end_date))
+                if value
             )
+            url = f"{self.base_url}/timesheet/{email}/{system}"
+
+            if params:
+                response = self.session.get(url, params=params)
+            else:
+                response = self.session.get(url)
 
             if response.status_code == 200:
                 return response.json()
@@ -159,12 +199,16 @@ class UltimateTimesheetClient:
 # Initialize API client
 api_client = UltimateTimesheetClient()
 
-# Global conversation history for the interface
-conversation_history = []
+# Per-session conversation log size (each Gradio session owns its own deque via gr.State)
+HISTORY_MAXLEN = 64
+
+def new_conversation_history() -> deque:
+    """Create an empty, bounded per-session conversation log"""
+    return deque(maxlen=HISTORY_MAXLEN)
 
-def add_to_history(user_msg: str, bot_response: str, phase: str = ""):
+def add_to_history(conversation_history: deque, user_msg: str, bot_response: str, phase: str = ""):
     """Add exchange to conversation history"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
+    timestamp = time.strftime("%H:%M:%S")
     conversation_history.append({
         "timestamp": timestamp,
         "user": user_msg,
@@ -172,32 +216,17 @@ def add_to_history(user_msg: str, bot_response: str, phase: str = ""):
         "phase": phase
     })
 
-def format_conversation_display() -> str:
-    """Format conversation for display"""
-    if not conversation_history:
-        return "💬 **Conversation will appear here**\n\nStart by typing a message or try one of the examples!"
-
-    formatted = []
-    for entry in conversation_history[-8:]:  # Show last 8 exchanges
-        formatted.append(f"**[{entry['timestamp']}] 👤 You:**")
-        formatted.append(f"{entry['user']}\n")
-        formatted.append(f"**🤖 Assistant:** ({entry.get('phase', 'unknown')})")
-        formatted.append(f"{entry['bot']}\n")
-        formatted.append("---\n")
-
-    return "\n".join(formatted)
-
 # Main chat processing function
-def process_chat(email: str, message: str, history):
+def process_chat(email: str, message: str, history, conversation_history: deque):
     """Process chat message through API"""
     if not email.strip():
         error_msg = "⚠️ Please enter your email address first"
         history.append([message, error_msg])
-        add_to_history(message, error_msg, "error")
-        return history, "", format_conversation_display()
+        add_to_history(conversation_history, message, error_msg, "error")
+        return history, "", conversation_history
 
     if not message.strip():
-        return history, "", format_conversation_display()
+        return history, "", conversation_history
 
     # Call the Ultimate API
     result = api_client.chat(email.strip(), message.strip())
@@ -208,29 +237,27 @@ def process_chat(email: str, message: str, history):
     tabular_data = result.get("tabular_data")
     suggestions = result.get("suggestions", [])
 
-    # Enhance response with tabular data
+    # Enhance response with tabular data and suggestions in a single join
+    parts = [bot_response]
     if tabular_data:
-        enhanced_response = f"{bot_response}\n\n{tabular_data}"
-    else:
-        enhanced_response = bot_response
+        parts.append("\n\n")
+        parts.append(tabular_data)
 
-    # Add suggestions if available
     if suggestions:
-        enhanced_response += "\n\n💡 **Suggestions:**\n"
-        for suggestion in suggestions[:3]:  # Limit to 3 suggestions
-            enhanced_response += f"• {suggestion}\n"
+        parts.append("\n\n💡 **Suggestions:**\n")
+        parts.extend(f"• {suggestion}\n" for suggestion in islice(suggestions, 3))  # Limit to 3 suggestions
+
+    enhanced_response = "".join(parts)
 
     # Update conversation history
     history.append([message, enhanced_response])
-    add_to_history(message, enhanced_response, conversation_phase)
+    add_to_history(conversation_history, message, enhanced_response, conversation_phase)
 
-    return history, "", format_conversation_display()
+    return history, "", conversation_history
 
 def clear_conversation():
     """Clear conversation history"""
-    global conversation_history
-    conversation_history = []
-    return [], "", "💬 **Conversation cleared!**\n\nStart fresh with your timesheet questions."
+    return [], "", new_conversation_history()
 
 def check_api_status():
     """Check API status"""
@@ -248,7 +275,7 @@ def show_projects(system):
     projects_df = None
     if result.get("projects"):
         try:
-            projects_df = pd.DataFrame(result["projects"])
+            projects_df = _pd().DataFrame(result["projects"])
         except Exception as e:
             print(f"Error creating DataFrame: {e}")
 
@@ -298,7 +325,7 @@ def show_timesheet(email, system, start_date, end_date):
     timesheet_df = None
     if result.get("entries"):
         try:
-            timesheet_df = pd.DataFrame(result["entries"])
+            timesheet_df = _pd().DataFrame(result["entries"])
         except Exception as e:
             print(f"Error creating timesheet DataFrame: {e}")
 
@@ -312,16 +339,16 @@ def submit_quick_entry(email, system, date_input, hours, project_code, task_code
     # FIXED: Handle datetime input properly
     try:
         if isinstance(date_input, str):
-            date_str = date_input.strip() if date_input.strip() else datetime.now().strftime("%Y-%m-%d")
+            date_str = date_input.strip() if date_input.strip() else today_str()
         elif hasattr(date_input, 'strftime'):
             date_str = date_input.strftime("%Y-%m-%d")
         elif hasattr(date_input, 'date'):
             date_str = date_input.date().strftime("%Y-%m-%d")
         else:
-            date_str = datetime.now().strftime("%Y-%m-%d")
+            date_str = today_str()
     except Exception as e:
         print(f"Error processing date_input: {e}")
-        date_str = datetime.now().strftime("%Y-%m-%d")
+        date_str = today_str()
 
     # Format the entry as a conversational prompt
     prompt_parts = [f"{hours} hours", f"{system} project {project_code}", f"on {date_str}"]
@@ -428,6 +455,9 @@ def create_ultimate_interface():
                                 scale=4
                             )
 
+                        # Per-session conversation log
+                        conversation_state = gr.State(new_conversation_history)
+
                         with gr.Row():
                             send_btn = gr.Button("📤 Send", variant="primary", scale=1)
                             clear_btn = gr.Button("🗑️ Clear Chat", variant="secondary", scale=1)
@@ -435,37 +465,7 @@ def create_ultimate_interface():
                     
 
                 # Examples section
-                gr.HTML("""
-                <div style='background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%); color: white; padding: 20px; border-radius: 15px; margin: 20px 0;'>
-                    <h3>🎯 Example Commands & Natural Language</h3>
-                    <div style='display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin-top: 15px;'>
-                        <div style='background: rgba(255, 255, 255, 0.2); padding: 15px; border-radius: 10px;'>
-                            <h4>📝 Add Entries</h4>
-                            <ul>
-                                <li>"8 hours Oracle ORG-001 yesterday"</li>
-                                <li>"Mars: 4 hours MRS-002, Oracle: 4 hours ORG-003, both today"</li>
-                                <li>"6 hours ORG-001 today, task DEV-001, database work"</li>
-                            </ul>
-                        </div>
-                        <div style='background: rgba(255, 255, 255, 0.2); padding: 15px; border-radius: 10px;'>
-                            <h4>📊 View Data</h4>
-                            <ul>
-                                <li>"show my Oracle timesheet"</li>
-                                <li>"show timesheet Mars"</li>
-                                <li>"show my entries from last week"</li>
-                            </ul>
-                        </div>
-                        <div style='background: rgba(255, 255, 255, 0.2); padding: 15px; border-radius: 10px;'>
-                            <h4>📋 Get Help</h4>
-                            <ul>
-                                <li>"show projects Oracle"</li>
-                                <li>"help"</li>
-                                <li>"start fresh"</li>
-                            </ul>
-                        </div>
-                    </div>
-                </div>
-                """)
+                gr.HTML(load_static_text("timesheet_examples.html"))
 
             # Tab 2: Project Codes
             with gr.TabItem("📋 Project Codes"):
@@ -565,7 +565,7 @@ def create_ultimate_interface():
                         # FIXED: Use Textbox instead of DateTime
                         quick_date = gr.Textbox(
                             label="📅 Date",
-                            value=datetime.now().strftime("%Y-%m-%d"),
+                            value=today_str(),
                             placeholder="YYYY-MM-DD format"
                         )
 
@@ -607,78 +607,26 @@ def create_ultimate_interface():
 
             # Tab 5: Help & Documentation
             with gr.TabItem("❓ Help & Documentation"):
-                gr.HTML("""
-                <div style='background: white; padding: 30px; border-radius: 15px; margin: 20px 0;'>
-                    <h2>🎯 Ultimate Timesheet Assistant - Help</h2>
-
-                    <h3>🚀 Getting Started</h3>
-                    <p><strong>The Ultimate Timesheet Assistant</strong> uses natural language to help you manage your Oracle and Mars timesheets with 50+ years of professional expertise.</p>
-
-                    <h3>💬 Conversational Features</h3>
-                    <ul>
-                        <li><strong>Natural Language:</strong> "8 hours Oracle ORG-001 yesterday"</li>
-                        <li><strong>Multi-System Support:</strong> "Oracle: 4 hours ORG-001, Mars: 4 hours MRS-002, both today"</li>
-                        <li><strong>Intelligent Prompting:</strong> The AI asks for missing information</li>
-                        <li><strong>Confirmation Flow:</strong> Always confirms before submitting</li>
-                    </ul>
-
-                    <h3>📋 Available Commands</h3>
-                    <table style="width:100%; border-collapse: collapse; margin: 20px 0;">
-                        <tr style="background: #f8f9fa;">
-                            <th style="padding: 12px; border: 1px solid #ddd;">Command</th>
-                            <th style="padding: 12px; border: 1px solid #ddd;">Description</th>
-                            <th style="padding: 12px; border: 1px solid #ddd;">Example</th>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px; border: 1px solid #ddd;"><code>show projects [system]</code></td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">Display project codes</td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">"show projects Oracle"</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px; border: 1px solid #ddd;"><code>show timesheet [system]</code></td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">View your entries</td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">"show timesheet Mars"</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px; border: 1px solid #ddd;"><code>help</code></td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">Get assistance</td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">"help"</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px; border: 1px solid #ddd;"><code>start fresh</code></td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">Clear session</td>
-                            <td style="padding: 8px; border: 1px solid #ddd;">"start fresh"</td>
-                        </tr>
-                    </table>
-
-                    <h3>🔧 Fixed Issues</h3>
-                    <ul>
-                        <li><strong>✅ DateTime Object Handling:</strong> Fixed datetime interpretation errors</li>
-                        <li><strong>✅ Date Input Format:</strong> Now uses text inputs with YYYY-MM-DD format</li>
-                        <li><strong>✅ Error Handling:</strong> Improved error handling for all datetime operations</li>
-                        <li><strong>✅ Gradio Compatibility:</strong> Enhanced compatibility with latest Gradio version</li>
-                    </ul>
-                </div>
-                """)
+                gr.Markdown(load_static_text("timesheet_help.md"))
 
         # Event Handlers - FIXED
 
         # Chat interface events
         send_btn.click(
             fn=process_chat,
-            inputs=[email_input, message_input, chatbot],
-            outputs=[chatbot, message_input]
+            inputs=[email_input, message_input, chatbot, conversation_state],
+            outputs=[chatbot, message_input, conversation_state]
         )
 
         message_input.submit(
             fn=process_chat,
-            inputs=[email_input, message_input, chatbot],
-            outputs=[chatbot, message_input]
+            inputs=[email_input, message_input, chatbot, conversation_state],
+            outputs=[chatbot, message_input, conversation_state]
         )
 
         clear_btn.click(
             fn=clear_conversation,
-            outputs=[chatbot, message_input]
+            outputs=[chatbot, message_input, conversation_state]
         )
 
         # API status check
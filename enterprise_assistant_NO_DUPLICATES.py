@@ -8,18 +8,28 @@
 """
 
 import gradio as gr
-import requests
+import aiohttp
+from yarl import URL
 import json
+import orjson
 import asyncio
+import atexit
+import codecs
 import time
 import os
 import getpass
+import html
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Tuple, List, Dict, Any
 import logging
+import re
+import threading
+import uuid
+from collections import OrderedDict
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())  # INFO logs every API call
 logger = logging.getLogger(__name__)
 
 # 🎯 API Configuration - Perfectly Aligned with Fixed APIs
@@ -31,7 +41,8 @@ API_CONFIG = {
         "name": "Timesheet Management",
         "description": "Manage your Oracle and Mars timesheets with AI assistance",
         "icon": "⏰",
-        "color": "#0066cc"
+        "color": "#0066cc",
+        "cache_responses": False  # Replies depend on the user's conversation state
     },
     "hr_policy": {
         "base_url": "http://localhost:8001", 
@@ -40,17 +51,133 @@ API_CONFIG = {
         "name": "HR Policy Assistant",
         "description": "Get answers about company policies and HR documents", 
         "icon": "📋",
-        "color": "#7c3aed"
+        "color": "#7c3aed",
+        "cache_responses": True
     }
 }
 
+# Email format check, compiled once; \Z rejects a trailing newline that $ would allow
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+
+# Message timestamps only show hours and minutes, so format once per minute
+_TIME_LABEL_CACHE = [-1, ""]
+
+def current_time_label() -> str:
+    """Return the current time as e.g. '02:35 PM', reformatted only when the minute changes"""
+    minute = int(time.time()) // 60
+    if minute != _TIME_LABEL_CACHE[0]:
+        _TIME_LABEL_CACHE[0] = minute
+        _TIME_LABEL_CACHE[1] = datetime.now().strftime("%I:%M %p")
+    return _TIME_LABEL_CACHE[1]
+
+# Precompute the full endpoint URL for each service once, pre-parsed for aiohttp
+for _config in API_CONFIG.values():
+    _config["url"] = URL(_config["base_url"] + _config["endpoint"])
+
+# Sent on every backend call; keep-alive lets the pooled connections be reused
+API_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+    "Connection": "keep-alive"
+}
+
+# Chat header shown above the conversation; only the email varies per session
+CHAT_HEADER_TEMPLATE = """
+<div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 12px 12px 0 0; margin-bottom: 0;">
+    <div style="display: flex; align-items: center; justify-content: space-between;">
+        <div style="display: flex; align-items: center; gap: 12px;">
+            <div style="font-size: 1.5rem;">{icon}</div>
+            <div>
+                <h3 style="margin: 0; font-size: 1.25rem; font-weight: 600;">{name}</h3>
+                <p style="margin: 0; opacity: 0.9; font-size: 0.9rem;">{description}</p>
+            </div>
+        </div>
+        <div style="text-align: right; font-size: 0.85rem; opacity: 0.9;">
+            <div>📧 {email}</div>
+            <div style="margin-top: 4px;">🟢 Connected</div>
+        </div>
+    </div>
+</div>
+"""
+
+# Per-service headers rendered at import, leaving only the {email} placeholder
+CHAT_HEADERS = {
+    service: CHAT_HEADER_TEMPLATE.format_map({**config, "email": "{email}"})
+    for service, config in API_CONFIG.items()
+}
+
+def render_chat_header(service: str, email: str) -> str:
+    """Fill the pre-rendered service header with the user's email"""
+    return CHAT_HEADERS[service].replace("{email}", email)
+
+# Message bubble templates - only content and timestamp vary per message
+USER_MESSAGE_TEMPLATE = """
+<div style="display: flex; justify-content: flex-end; margin: 15px 0;">
+    <div style="background: linear-gradient(135deg, #0066cc, #004499); color: white; padding: 12px 16px; border-radius: 18px 18px 4px 18px; max-width: 80%; box-shadow: 0 2px 8px rgba(0,102,204,0.3);">
+        <div style="font-weight: 500; margin-bottom: 4px;">You</div>
+        <div style="line-height: 1.5;">{content}</div>
+        <div style="font-size: 11px; opacity: 0.8; margin-top: 8px; text-align: right;">{timestamp}</div>
+    </div>
+</div>"""
+
+ASSISTANT_MESSAGE_TEMPLATE = """
+<div style="display: flex; justify-content: flex-start; margin: 15px 0;">
+    <div style="background: linear-gradient(135deg, #f8f9fa, #e9ecef); color: #333; padding: 12px 16px; border-radius: 18px 18px 18px 4px; max-width: 80%; box-shadow: 0 2px 8px rgba(0,0,0,0.1); border-left: 4px solid {color};">
+        <div style="font-weight: 600; margin-bottom: 8px; color: {color};">
+            {icon} {name}
+        </div>
+        <div style="line-height: 1.6; white-space: pre-wrap;">{content}</div>
+        <div style="font-size: 11px; color: #666; margin-top: 8px;">{timestamp}</div>
+    </div>
+</div>"""
+
+def _build_assistant_template(name: str, icon: str, color: str) -> str:
+    """Bake service branding into the assistant bubble, keeping content/timestamp placeholders"""
+    return ASSISTANT_MESSAGE_TEMPLATE.format(
+        name=name, icon=icon, color=color, content="{content}", timestamp="{timestamp}"
+    )
+
+ASSISTANT_MESSAGE_TEMPLATES = {
+    service: _build_assistant_template(config["name"], config["icon"], config["color"])
+    for service, config in API_CONFIG.items()
+}
+DEFAULT_ASSISTANT_MESSAGE_TEMPLATE = _build_assistant_template("Assistant", "🤖", "#7c3aed")
+
+# Bubbles shorter than this are memoized
+MEMOIZE_MAX_CHARS = 4096
+
+def _render_chat_message(role: str, content: str, timestamp: str, service: str) -> str:
+    """Fill the bubble template for a message"""
+    if role == "user":
+        template = USER_MESSAGE_TEMPLATE
+    else:
+        template = ASSISTANT_MESSAGE_TEMPLATES.get(service, DEFAULT_ASSISTANT_MESSAGE_TEMPLATE)
+
+    return template.format(content=html.escape(content), timestamp=timestamp)
+
+_render_chat_message_cached = lru_cache(maxsize=2048)(_render_chat_message)
+
+def format_chat_message(role: str, content: str, timestamp: str = None, service: str = None) -> str:
+    """Format message with ChatGPT-style appearance - EXACT SAME AS ORIGINAL"""
+    if timestamp is None:
+        timestamp = current_time_label()
+
+    # Short bubbles (welcome text, canned replies) recur; hashing long bodies costs more than rendering
+    if len(content) < MEMOIZE_MAX_CHARS:
+        return _render_chat_message_cached(role, content, timestamp, service)
+    return _render_chat_message(role, content, timestamp, service)
+
+# Oldest messages drop off past this point so a long session stays a fixed size
+MAX_HISTORY_MESSAGES = 100
+
 class ChatState:
     """Enhanced chat state management with ChatGPT-like features"""
     def __init__(self):
         self.selected_service = None
-        # Auto-detect Windows username
-        self.user_email = f"{getpass.getuser()}@company.com"  # Auto Windows username
+        # Auto-detected Windows username, resolved once at import
+        self.user_email = DEFAULT_EMAIL
         self.conversation_history = []
+        self.rendered_html = ""  # Concatenated bubble HTML of conversation_history
         self.is_initialized = False
         self.session_start = datetime.now()
         self.message_count = 0
@@ -59,12 +186,56 @@ class ChatState:
         """Reset state for fresh conversation"""
         self.selected_service = None
         # Keep the auto-detected username
-        self.user_email = f"{getpass.getuser()}@company.com"
+        self.user_email = DEFAULT_EMAIL
         self.conversation_history = []
+        self.rendered_html = ""  # Concatenated bubble HTML of conversation_history
         self.is_initialized = False
         self.session_start = datetime.now()
         self.message_count = 0
 
+    def add_message(self, role: str, content: str, timestamp: str, service: str = None, rendered: str = None) -> str:
+        """Append a message to history, rendering its bubble HTML exactly once (unless passed in as rendered)"""
+        entry = {
+            "role": role,
+            "content": content,
+            "timestamp": timestamp
+        }
+        if service is not None:
+            entry["service"] = service
+        if rendered is None:
+            rendered = format_chat_message(role, content, timestamp, service or self.selected_service)
+        entry["html"] = rendered
+
+        self.conversation_history.append(entry)
+        if len(self.conversation_history) > MAX_HISTORY_MESSAGES:
+            # Soft cap: drop the oldest messages and rebuild the rendered HTML from what is kept
+            self.conversation_history = self.conversation_history[-MAX_HISTORY_MESSAGES:]
+            self.rendered_html = "".join(msg["html"] for msg in self.conversation_history)
+        else:
+            self.rendered_html += entry["html"]
+        return entry["html"]
+
+# Server-side chat sessions keyed by the id held in gr.State, least recently used first
+MAX_SESSIONS = 1000
+_SESSIONS: "OrderedDict[str, ChatState]" = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()  # Sync handlers run on Gradio's worker threads
+
+def new_session_id() -> str:
+    """Create a fresh session id for a browser session"""
+    return str(uuid.uuid4())
+
+def get_chat_state(session_id: str) -> ChatState:
+    """Return the ChatState for a session, creating it (and evicting the oldest) as needed"""
+    with _SESSIONS_LOCK:
+        state = _SESSIONS.get(session_id)
+        if state is None:
+            state = _SESSIONS[session_id] = ChatState()
+            if len(_SESSIONS) > MAX_SESSIONS:
+                _SESSIONS.popitem(last=False)
+        else:
+            _SESSIONS.move_to_end(session_id)
+        return state
+
 def get_windows_username():
     """Get current Windows username"""
     try:
@@ -74,17 +245,77 @@ def get_windows_username():
 
 def validate_email(email: str) -> bool:
     """Professional email validation"""
-    import re
-    if not email:
-        return False
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
-
-async def call_api(service: str, message: str, email: str = None) -> Dict[str, Any]:
-    """Enhanced API calling with proper error handling"""
+    return bool(email) and EMAIL_PATTERN.match(email) is not None
+
+# Shared HTTP session - connections to the backends are pooled and kept alive
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use"""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=32,
+                keepalive_timeout=75,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True
+            ),
+            headers=API_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
+    return _SESSION
+
+def close_session():
+    """Close the shared aiohttp session on interpreter shutdown"""
+    if _SESSION is not None and not _SESSION.closed:
+        try:
+            asyncio.run(_SESSION.close())
+        except Exception:
+            pass
+
+atexit.register(close_session)
+
+# Exact-match cache of successful answers for services whose replies don't depend on the user
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = 3600  # seconds
+_RESPONSE_CACHE: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+async def call_api(service: str, message: str, email: str = None):
+    """Call a service API, answering repeated questions from the response cache when allowed
+
+    Yields fetch_api's results as they arrive; the last one is the complete answer."""
+    if not API_CONFIG[service].get("cache_responses"):
+        async for result in fetch_api(service, message, email):
+            yield result
+        return
+
+    cache_key = (service, " ".join(message.lower().split()))
+    cached = _RESPONSE_CACHE.get(cache_key)
+    if cached is not None and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL:
+        _RESPONSE_CACHE.move_to_end(cache_key)
+        yield cached[1]
+        return
+
+    result = None
+    async for result in fetch_api(service, message, email):
+        yield result
+    if result is not None and result["success"]:
+        _RESPONSE_CACHE[cache_key] = (time.monotonic(), result)
+        _RESPONSE_CACHE.move_to_end(cache_key)
+        if len(_RESPONSE_CACHE) > RESPONSE_CACHE_SIZE:
+            _RESPONSE_CACHE.popitem(last=False)
+
+async def fetch_api(service: str, message: str, email: str = None):
+    """Enhanced API calling with proper error handling - async generator of results
+
+    A text/plain (chunked) reply yields a partial result (``"partial": True``) with the
+    text received so far after every chunk, then the complete one; a JSON reply yields
+    a single result."""
     try:
         config = API_CONFIG[service]
-        url = f"{config['base_url']}{config['endpoint']}"
+        url = config["url"]
 
         # Prepare payload based on service type
         if service == "timesheet":
@@ -97,104 +328,76 @@ async def call_api(service: str, message: str, email: str = None) -> Dict[str, A
                 "question": message
             }
 
-        logger.info(f"Calling {service} API: {url}")
-
-        response = requests.post(
-            url,
-            json=payload,
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            },
-            timeout=30
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            logger.info(f"✅ {service} API responded successfully")
-
-            # Handle different response formats
-            if service == "timesheet":
-                return {
-                    "success": True,
-                    "message": data.get("response", data.get("message", "Response received successfully.")),
-                    "data": data.get("data", {})
-                }
-            else:  # hr_policy
-                answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
-                sources = data.get("sources", [])
-                if sources:
-                    answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
-                return {
-                    "success": True,
-                    "message": answer,
-                    "data": {"sources": sources}
+        logger.info("Calling %s API: %s", service, url)
+
+        session = await get_session()
+        async with session.post(url, data=orjson.dumps(payload)) as response:
+            if response.status == 200 and response.content_type == "text/plain":
+                # Streamed generation - surface each chunk as soon as the server flushes it
+                decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+                parts = []
+                async for raw in response.content.iter_chunked(512):
+                    text = decoder.decode(raw)
+                    if text:
+                        parts.append(text)
+                        yield {"success": True, "message": "".join(parts), "data": {}, "partial": True}
+                logger.info("✅ %s API streamed its response", service)
+                yield {"success": True, "message": "".join(parts), "data": {}}
+            elif response.status == 200:
+                data = orjson.loads(await response.read())
+                logger.info("✅ %s API responded successfully", service)
+
+                # Handle different response formats
+                if service == "timesheet":
+                    yield {
+                        "success": True,
+                        "message": data.get("response", data.get("message", "Response received successfully.")),
+                        "data": data.get("data", {})
+                    }
+                else:  # hr_policy
+                    answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
+                    sources = data.get("sources", [])
+                    if sources:
+                        answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
+                    yield {
+                        "success": True,
+                        "message": answer,
+                        "data": {"sources": sources}
+                    }
+            else:
+                logger.error("❌ API Error: %s", response.status)
+                yield {
+                    "success": False,
+                    "message": f"API Error ({response.status}): Please check if the service is running.",
+                    "data": {}
                 }
-        else:
-            logger.error(f"❌ API Error: {response.status_code}")
-            return {
-                "success": False,
-                "message": f"API Error ({response.status_code}): Please check if the service is running.",
-                "data": {}
-            }
 
-    except requests.exceptions.ConnectionError:
-        logger.error(f"❌ Connection error to {service} API")
-        return {
+    except aiohttp.ClientConnectorError:
+        logger.error("❌ Connection error to %s API", service)
+        yield {
             "success": False,
             "message": f"🔌 Cannot connect to {config['name']} service. Please ensure the API server is running on {config['base_url']}.",
             "data": {}
         }
-    except requests.exceptions.Timeout:
-        logger.error(f"❌ Timeout error for {service} API")
-        return {
+    except asyncio.TimeoutError:
+        logger.error("❌ Timeout error for %s API", service)
+        yield {
             "success": False, 
             "message": "⏱️ Request timed out. The server might be busy, please try again.",
             "data": {}
         }
     except Exception as e:
-        logger.error(f"❌ Unexpected error: {str(e)}")
-        return {
+        logger.error("❌ Unexpected error: %s", e)
+        yield {
             "success": False,
             "message": f"❌ An unexpected error occurred: {str(e)}",
             "data": {}
         }
 
-def format_chat_message(role: str, content: str, timestamp: str = None, service: str = None) -> str:
-    """Format message with ChatGPT-style appearance - EXACT SAME AS ORIGINAL"""
-    if timestamp is None:
-        timestamp = datetime.now().strftime("%I:%M %p")
-
-    if role == "user":
-        return f"""
-<div style="display: flex; justify-content: flex-end; margin: 15px 0;">
-    <div style="background: linear-gradient(135deg, #0066cc, #004499); color: white; padding: 12px 16px; border-radius: 18px 18px 4px 18px; max-width: 80%; box-shadow: 0 2px 8px rgba(0,102,204,0.3);">
-        <div style="font-weight: 500; margin-bottom: 4px;">You</div>
-        <div style="line-height: 1.5;">{content}</div>
-        <div style="font-size: 11px; opacity: 0.8; margin-top: 8px; text-align: right;">{timestamp}</div>
-    </div>
-</div>"""
-    else:
-        service_config = API_CONFIG.get(service, {})
-        service_name = service_config.get("name", "Assistant")
-        service_icon = service_config.get("icon", "🤖")
-        service_color = service_config.get("color", "#7c3aed")
-
-        return f"""
-<div style="display: flex; justify-content: flex-start; margin: 15px 0;">
-    <div style="background: linear-gradient(135deg, #f8f9fa, #e9ecef); color: #333; padding: 12px 16px; border-radius: 18px 18px 18px 4px; max-width: 80%; box-shadow: 0 2px 8px rgba(0,0,0,0.1); border-left: 4px solid {service_color};">
-        <div style="font-weight: 600; margin-bottom: 8px; color: {service_color};">
-            {service_icon} {service_name}
-        </div>
-        <div style="line-height: 1.6; white-space: pre-wrap;">{content}</div>
-        <div style="font-size: 11px; color: #666; margin-top: 8px;">{timestamp}</div>
-    </div>
-</div>"""
-
 def create_clickable_welcome_html(username: str) -> str:
-    """Create welcome HTML with WORKING clickable service areas"""
+    """Create the welcome banner shown above the service tile buttons"""
     return f"""
-<div style="max-width: 800px; margin: 50px auto; text-align: center; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
+<div style="max-width: 800px; margin: 50px auto 0; text-align: center; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
     <div style="margin-bottom: 40px;">
         <h1 style="font-size: 2.5rem; font-weight: 700; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); -webkit-background-clip: text; -webkit-text-fill-color: transparent; margin-bottom: 8px;">
             🏢 Enterprise Assistant
@@ -202,62 +405,23 @@ def create_clickable_welcome_html(username: str) -> str:
         <p style="font-size: 1.2rem; color: #666; margin: 0;">Your AI-powered workspace companion</p>
         <p style="font-size: 1rem; color: #888; margin-top: 10px;">Welcome, <strong>{username}</strong>!</p>
     </div>
-
-    <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 30px; margin-top: 40px;">
-        <div onclick="window.selectTimesheet && window.selectTimesheet()" 
-             style="background: white; border-radius: 20px; padding: 40px 30px; border: 2px solid #e0e7ff; transition: all 0.3s ease; cursor: pointer; box-shadow: 0 4px 20px rgba(0,0,0,0.08);"
-             onmouseover="this.style.transform='translateY(-5px)'; this.style.boxShadow='0 8px 30px rgba(0,102,204,0.15)'; this.style.borderColor='#0066cc';"
-             onmouseout="this.style.transform='translateY(0)'; this.style.boxShadow='0 4px 20px rgba(0,0,0,0.08)'; this.style.borderColor='#e0e7ff';">
-            <div style="font-size: 4rem; margin-bottom: 20px;">⏰</div>
-            <h3 style="font-weight: 600; color: #0066cc; margin-bottom: 15px; font-size: 1.3rem;">Timesheet Management</h3>
-            <p style="color: #666; font-size: 1rem; line-height: 1.5; margin: 0;">Manage Oracle and Mars timesheets with AI assistance</p>
-        </div>
-
-        <div onclick="window.selectHRPolicy && window.selectHRPolicy()" 
-             style="background: white; border-radius: 20px; padding: 40px 30px; border: 2px solid #f3e8ff; transition: all 0.3s ease; cursor: pointer; box-shadow: 0 4px 20px rgba(0,0,0,0.08);"
-             onmouseover="this.style.transform='translateY(-5px)'; this.style.boxShadow='0 8px 30px rgba(124,58,237,0.15)'; this.style.borderColor='#7c3aed';"
-             onmouseout="this.style.transform='translateY(0)'; this.style.boxShadow='0 4px 20px rgba(0,0,0,0.08)'; this.style.borderColor='#f3e8ff';">
-            <div style="font-size: 4rem; margin-bottom: 20px;">📋</div>
-            <h3 style="font-weight: 600; color: #7c3aed; margin-bottom: 15px; font-size: 1.3rem;">HR Policy Assistant</h3>
-            <p style="color: #666; font-size: 1rem; line-height: 1.5; margin: 0;">Get answers about policies and HR documents</p>
-        </div>
-    </div>
-
-    <div style="margin-top: 30px; color: #999; font-size: 0.9rem;">
-        🔐 Your conversations are secure and private
-    </div>
 </div>
+"""
 
-<script>
-// Make service selection functions globally available
-window.selectTimesheet = function() {{
-    console.log('Timesheet selected via click');
-    // Trigger the hidden timesheet button
-    const timesheetBtn = document.querySelector('button[data-service="timesheet"]');
-    if (timesheetBtn) {{
-        timesheetBtn.click();
-    }} else {{
-        console.log('Timesheet button not found');
-    }}
-}};
-
-window.selectHRPolicy = function() {{
-    console.log('HR Policy selected via click');
-    // Trigger the hidden HR policy button
-    const hrPolicyBtn = document.querySelector('button[data-service="hr_policy"]');
-    if (hrPolicyBtn) {{
-        hrPolicyBtn.click();
-    }} else {{
-        console.log('HR Policy button not found');
-    }}
-}};
-
-console.log('Service selection functions initialized');
-</script>
+WELCOME_FOOTER_HTML = """
+<div style="margin: 30px auto 50px; text-align: center; color: #999; font-size: 0.9rem;">
+    🔐 Your conversations are secure and private
+</div>
 """
 
-def select_service(service: str, email: str, state: ChatState) -> Tuple[gr.update, gr.update, str, str, gr.update, gr.update, ChatState]:
+# Username, default email and welcome screen are fixed for the process lifetime
+WINDOWS_USERNAME = get_windows_username()
+DEFAULT_EMAIL = f"{WINDOWS_USERNAME}@company.com"
+WELCOME_HTML = create_clickable_welcome_html(WINDOWS_USERNAME)
+
+def select_service(service: str, email: str, session_id: str) -> Tuple[gr.update, gr.update, str, str, gr.update, gr.update]:
     """Handle service selection with exact same logic as original - NOT ASYNC"""
+    state = get_chat_state(session_id)
 
     # Validate email (auto-generated)
     if not email or not validate_email(email):
@@ -268,13 +432,13 @@ def select_service(service: str, email: str, state: ChatState) -> Tuple[gr.updat
             gr.update(),               # msg_input
             gr.update(),               # send_btn
             gr.update(value="❌ Please enter a valid email address", visible=True),  # status
-            state
         )
 
     # Update state
     state.selected_service = service
     state.user_email = email
     state.conversation_history = []
+    state.rendered_html = ""
     state.is_initialized = True
     state.message_count = 0
 
@@ -287,42 +451,17 @@ def select_service(service: str, email: str, state: ChatState) -> Tuple[gr.updat
 How can I help you today? Feel free to ask me anything related to {config['name'].lower()}."""
 
     # Add welcome message to history
-    state.conversation_history.append({
-        "role": "assistant", 
-        "content": welcome_message,
-        "timestamp": datetime.now().strftime("%I:%M %p"),
-        "service": service
-    })
+    welcome_msg_formatted = state.add_message(
+        "assistant",
+        welcome_message,
+        current_time_label(),
+        service
+    )
 
     # Create initial chat display with EXACT SAME formatting as original
-    chat_header = f"""
-<div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 12px 12px 0 0; margin-bottom: 0;">
-    <div style="display: flex; align-items: center; justify-content: space-between;">
-        <div style="display: flex; align-items: center; gap: 12px;">
-            <div style="font-size: 1.5rem;">{config['icon']}</div>
-            <div>
-                <h3 style="margin: 0; font-size: 1.25rem; font-weight: 600;">{config['name']}</h3>
-                <p style="margin: 0; opacity: 0.9; font-size: 0.9rem;">{config['description']}</p>
-            </div>
-        </div>
-        <div style="text-align: right; font-size: 0.85rem; opacity: 0.9;">
-            <div>📧 {email}</div>
-            <div style="margin-top: 4px;">🟢 Connected</div>
-        </div>
-    </div>
-</div>
-"""
+    chat_header = render_chat_header(service, email)
 
-    welcome_msg_formatted = format_chat_message("assistant", welcome_message, service=service)
-
-    chat_html = f"""
-<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
-    {chat_header}
-    <div style="background: white; min-height: 400px; padding: 20px; border-radius: 0 0 12px 12px; box-shadow: 0 8px 32px rgba(0,0,0,0.1);">
-        {welcome_msg_formatted}
-    </div>
-</div>
-"""
+    chat_html = render_chat_frame(chat_header, welcome_msg_formatted)
 
     return (
         gr.update(visible=False),  # welcome_screen
@@ -331,19 +470,36 @@ How can I help you today? Feel free to ask me anything related to {config['name'
         gr.update(placeholder="Type your message here... (Press Enter to send)", interactive=True, value=""),  # msg_input
         gr.update(interactive=True),  # send_btn
         gr.update(value=f"✅ Connected to {config['name']}", visible=True),  # status
-        state
     )
 
+# Answers longer than this are escaped/rendered in a worker thread so other chats stay responsive
+OFFLOAD_RENDER_CHARS = 16384
+
+# Scrollable chat frame, split so a rendered prefix can be reused across yields
+CHAT_FRAME_OPEN = """
+<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
+    {chat_header}
+    <div style="background: white; min-height: 400px; padding: 20px; border-radius: 0 0 12px 12px; box-shadow: 0 8px 32px rgba(0,0,0,0.1); max-height: 600px; overflow-y: auto;">
+        """
+CHAT_FRAME_CLOSE = """
+    </div>
+</div>
+"""
+
+def render_chat_frame(chat_header: str, messages_html: str) -> str:
+    """Wrap the header and message bubbles in the scrollable chat frame"""
+    return CHAT_FRAME_OPEN.format(chat_header=chat_header) + messages_html + CHAT_FRAME_CLOSE
+
 # FIXED: Async generator function with proper yield usage ONLY
-async def send_message(message: str, state: ChatState):
+async def send_message(message: str, session_id: str):
     """Send message with EXACT SAME processing as original - ASYNC GENERATOR FIXED"""
+    state = get_chat_state(session_id)
 
     if not message.strip():
         yield (
             gr.update(),  # chat_display
             "",           # msg_input (clear)
             gr.update(value="Please enter a message", visible=True),  # status
-            state
         )
         return  # Exit without value
 
@@ -352,48 +508,20 @@ async def send_message(message: str, state: ChatState):
             gr.update(),  # chat_display
             message,      # msg_input (keep message)
             gr.update(value="❌ Please select a service first", visible=True),  # status
-            state
         )
         return  # Exit without value
 
     # Add user message to history
-    timestamp = datetime.now().strftime("%I:%M %p")
-    state.conversation_history.append({
-        "role": "user", 
-        "content": message,
-        "timestamp": timestamp
-    })
+    timestamp = current_time_label()
+    state.add_message("user", message, timestamp)
     state.message_count += 1
 
     # Create updated chat display with user message - EXACT SAME as original
     config = API_CONFIG[state.selected_service]
-    chat_header = f"""
-<div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 12px 12px 0 0; margin-bottom: 0;">
-    <div style="display: flex; align-items: center; justify-content: space-between;">
-        <div style="display: flex; align-items: center; gap: 12px;">
-            <div style="font-size: 1.5rem;">{config['icon']}</div>
-            <div>
-                <h3 style="margin: 0; font-size: 1.25rem; font-weight: 600;">{config['name']}</h3>
-                <p style="margin: 0; opacity: 0.9; font-size: 0.9rem;">{config['description']}</p>
-            </div>
-        </div>
-        <div style="text-align: right; font-size: 0.85rem; opacity: 0.9;">
-            <div>📧 {state.user_email}</div>
-            <div style="margin-top: 4px;">🟢 Connected</div>
-        </div>
-    </div>
-</div>
-"""
+    chat_header = render_chat_header(state.selected_service, state.user_email)
 
-    # Build conversation HTML - EXACT SAME as original
-    messages_html = ""
-    for msg in state.conversation_history:
-        messages_html += format_chat_message(
-            msg["role"], 
-            msg["content"], 
-            msg["timestamp"], 
-            msg.get("service", state.selected_service)
-        )
+    # Header and history are rendered once; each yield below only appends the trailing bubble
+    frame_prefix = CHAT_FRAME_OPEN.format(chat_header=chat_header) + state.rendered_html
 
     # Add typing indicator - EXACT SAME as original
     typing_indicator = f"""
@@ -421,30 +549,26 @@ async def send_message(message: str, state: ChatState):
 </style>
 """
 
-    chat_with_typing = f"""
-<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
-    {chat_header}
-    <div style="background: white; min-height: 400px; padding: 20px; border-radius: 0 0 12px 12px; box-shadow: 0 8px 32px rgba(0,0,0,0.1);">
-        {messages_html}
-        {typing_indicator}
-    </div>
-</div>
-"""
+    chat_with_typing = frame_prefix + typing_indicator + CHAT_FRAME_CLOSE
 
     # Show typing state first
     yield (
         chat_with_typing,  # chat_display with typing
         "",                # msg_input (clear)
         gr.update(value=f"🤔 {config['name']} is thinking...", visible=True),  # status
-        state
     )
 
-    # Small delay for realistic typing effect
-    await asyncio.sleep(1)
-
     try:
-        # Call API
-        api_result = await call_api(state.selected_service, message, state.user_email)
+        # Call API - a streamed reply is shown while it is still being generated
+        async for api_result in call_api(state.selected_service, message, state.user_email):
+            if api_result.get("partial"):
+                # Partials are throwaway prefixes - rendered directly, never through the memo
+                partial_html = _render_chat_message("assistant", api_result["message"], current_time_label(), state.selected_service)
+                yield (
+                    frame_prefix + partial_html + CHAT_FRAME_CLOSE,  # chat_display
+                    "",  # msg_input (keep clear)
+                    gr.update(value=f"✍️ {config['name']} is responding...", visible=True),  # status
+                )
 
         if api_result["success"]:
             response = api_result["message"]
@@ -457,132 +581,146 @@ async def send_message(message: str, state: ChatState):
         response = f"I apologize, but I encountered an unexpected error: {str(e)}\n\nPlease try again or contact support if the issue persists."
         status_msg = f"❌ Error communicating with {config['name']}"
 
-    # Add assistant response to history
-    state.conversation_history.append({
-        "role": "assistant",
-        "content": response, 
-        "timestamp": datetime.now().strftime("%I:%M %p"),
-        "service": state.selected_service
-    })
-
-    # Create final chat display without typing indicator - EXACT SAME as original
-    final_messages_html = ""
-    for msg in state.conversation_history:
-        final_messages_html += format_chat_message(
-            msg["role"],
-            msg["content"], 
-            msg["timestamp"],
-            msg.get("service", state.selected_service)
+    # Add assistant response to history; escaping a long answer runs off the event loop,
+    # but the session itself is only changed here on the loop
+    response_timestamp = current_time_label()
+    rendered = None
+    if len(response) > OFFLOAD_RENDER_CHARS:
+        rendered = await asyncio.to_thread(
+            format_chat_message, "assistant", response, response_timestamp, state.selected_service
         )
+    assistant_html = state.add_message("assistant", response, response_timestamp, state.selected_service, rendered)
 
-    final_chat = f"""
-<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
-    {chat_header}
-    <div style="background: white; min-height: 400px; padding: 20px; border-radius: 0 0 12px 12px; box-shadow: 0 8px 32px rgba(0,0,0,0.1); max-height: 600px; overflow-y: auto;">
-        {final_messages_html}
-    </div>
-</div>
-"""
+    # Create final chat display without typing indicator - EXACT SAME as original
+    final_chat = frame_prefix + assistant_html + CHAT_FRAME_CLOSE
 
     yield (
         final_chat,  # chat_display
         "",          # msg_input (keep clear)
         gr.update(value=status_msg, visible=True),  # status
-        state
     )
 
-def reset_conversation(state: ChatState) -> Tuple[gr.update, gr.update, str, gr.update, gr.update, gr.update, ChatState]:
+def reset_conversation(session_id: str) -> Tuple[gr.update, gr.update, str, gr.update, gr.update, gr.update]:
     """Reset to welcome screen for fresh conversation - NOT ASYNC"""
+    state = get_chat_state(session_id)
 
     # Reset state
     state.reset()
 
-    # Create fresh welcome screen
-    username = get_windows_username()
-    welcome_html = create_clickable_welcome_html(username)
-
     return (
         gr.update(visible=True),   # welcome_screen
         gr.update(visible=False),  # chat_interface
-        welcome_html,              # welcome_display  
+        WELCOME_HTML,              # welcome_display  
         gr.update(value="", interactive=False),  # msg_input
         gr.update(interactive=False),  # send_btn
         gr.update(value="Ready to start a new conversation", visible=True),  # status
-        state
     )
 
-# 🎨 Create the main ChatGPT-EXACT interface with NO DUPLICATE TILES
-def create_no_duplicate_interface():
-    """Create interface with ONLY clickable HTML tiles - NO DUPLICATE BUTTONS"""
-
-    # Custom CSS for EXACT SAME styling as original
-    custom_css = """
-    /* EXACT SAME ChatGPT styling as original */
-    .gradio-container {
-        max-width: 1200px !important;
-        margin: 0 auto !important;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
-    }
+# Custom CSS for EXACT SAME styling as original
+CUSTOM_CSS = """
+/* EXACT SAME ChatGPT styling as original */
+.gradio-container {
+    max-width: 1200px !important;
+    margin: 0 auto !important;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
+}
 
-    .chat-interface {
-        background: #f7f7f8 !important;
-        border-radius: 12px !important;
-        box-shadow: 0 8px 32px rgba(0,0,0,0.1) !important;
-    }
+.chat-interface {
+    background: #f7f7f8 !important;
+    border-radius: 12px !important;
+    box-shadow: 0 8px 32px rgba(0,0,0,0.1) !important;
+}
 
-    .message-input {
-        border-radius: 12px !important;
-        border: 2px solid #e0e0e0 !important;
-        font-size: 16px !important;
-        padding: 12px 16px !important;
-    }
+.message-input {
+    border-radius: 12px !important;
+    border: 2px solid #e0e0e0 !important;
+    font-size: 16px !important;
+    padding: 12px 16px !important;
+}
 
-    .message-input:focus {
-        border-color: #0066cc !important;
-        box-shadow: 0 0 0 3px rgba(0, 102, 204, 0.1) !important;
-    }
+.message-input:focus {
+    border-color: #0066cc !important;
+    box-shadow: 0 0 0 3px rgba(0, 102, 204, 0.1) !important;
+}
 
-    .send-button {
-        background: linear-gradient(135deg, #0066cc, #004499) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 8px !important;
-        padding: 12px 24px !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-    }
+.send-button {
+    background: linear-gradient(135deg, #0066cc, #004499) !important;
+    color: white !important;
+    border: none !important;
+    border-radius: 8px !important;
+    padding: 12px 24px !important;
+    font-weight: 600 !important;
+    transition: all 0.3s ease !important;
+}
 
-    .send-button:hover {
-        background: linear-gradient(135deg, #0052a3, #003366) !important;
-        transform: translateY(-1px) !important;
-    }
+.send-button:hover {
+    background: linear-gradient(135deg, #0052a3, #003366) !important;
+    transform: translateY(-1px) !important;
+}
 
-    .reset-button {
-        background: #dc3545 !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 8px !important;
-        padding: 8px 16px !important;
-        font-weight: 500 !important;
-    }
+.reset-button {
+    background: #dc3545 !important;
+    color: white !important;
+    border: none !important;
+    border-radius: 8px !important;
+    padding: 8px 16px !important;
+    font-weight: 500 !important;
+}
 
-    .status-display {
-        background: #f8f9fa !important;
-        border: 1px solid #dee2e6 !important;
-        border-radius: 8px !important;
-        padding: 8px 12px !important;
-        font-size: 14px !important;
-    }
+.status-display {
+    background: #f8f9fa !important;
+    border: 1px solid #dee2e6 !important;
+    border-radius: 8px !important;
+    padding: 8px 12px !important;
+    font-size: 14px !important;
+}
 
-    /* Hide any extra buttons */
-    .hidden-button {
-        display: none !important;
-        visibility: hidden !important;
-        opacity: 0 !important;
-        position: absolute !important;
-        left: -9999px !important;
-    }
-    """
+/* Service selection tiles - real buttons styled as cards */
+.service-tiles {
+    max-width: 800px !important;
+    margin: 0 auto !important;
+    gap: 30px !important;
+}
+
+.service-tile {
+    background: white !important;
+    border-radius: 20px !important;
+    padding: 40px 30px !important;
+    border: 2px solid #e0e7ff !important;
+    box-shadow: 0 4px 20px rgba(0,0,0,0.08) !important;
+    color: #666 !important;
+    font-size: 1rem !important;
+    line-height: 1.5 !important;
+    white-space: pre-line !important;
+    transition: all 0.3s ease !important;
+}
+
+.service-tile::first-line {
+    font-size: 4rem !important;
+}
+
+.service-tile:hover {
+    transform: translateY(-5px) !important;
+}
+
+.service-tile-timesheet:hover {
+    box-shadow: 0 8px 30px rgba(0,102,204,0.15) !important;
+    border-color: #0066cc !important;
+}
+
+.service-tile-hr-policy {
+    border-color: #f3e8ff !important;
+}
+
+.service-tile-hr-policy:hover {
+    box-shadow: 0 8px 30px rgba(124,58,237,0.15) !important;
+    border-color: #7c3aed !important;
+}
+"""
+
+# 🎨 Create the main ChatGPT-EXACT interface with NO DUPLICATE TILES
+def create_no_duplicate_interface():
+    """Create interface with ONLY the clickable service tiles - NO DUPLICATE BUTTONS"""
 
     with gr.Blocks(
         title="🏢 Enterprise Assistant - No Duplicates",
@@ -592,12 +730,12 @@ def create_no_duplicate_interface():
             neutral_hue="gray",
             font=gr.themes.GoogleFont("Inter")
         ),
-        css=custom_css,
+        css=CUSTOM_CSS,
         fill_height=True
     ) as app:
 
-        # Application state
-        state = gr.State(ChatState())
+        # Application state - only the session id lives in gr.State, ChatState stays server-side
+        session_id = gr.State(new_session_id)
 
         # Title and description - EXACT SAME as original
         gr.Markdown("""
@@ -605,38 +743,30 @@ def create_no_duplicate_interface():
         ### Your AI-powered workspace companion with ChatGPT-style interface
         """, elem_classes=["text-center"])
 
-        # Welcome Screen - ONLY HTML TILES (NO DUPLICATE BUTTONS)
+        # Welcome Screen - the service tiles ARE the buttons (NO DUPLICATES, no JS bridge)
         with gr.Group(visible=True) as welcome_screen:
-            username = get_windows_username()
-
-            # ONLY the HTML welcome with clickable tiles
-            welcome_display = gr.HTML(create_clickable_welcome_html(username))
+            welcome_display = gr.HTML(WELCOME_HTML)
 
-            # Hidden email field with auto-detected username 
-            email_input = gr.Textbox(
-                value=f"{username}@company.com",
-                visible=False
-            )
-
-            # HIDDEN buttons for JavaScript to trigger (NO VISIBLE DUPLICATES)
-            with gr.Group(elem_classes=["hidden-button"]):
+            with gr.Row(elem_classes=["service-tiles"]):
                 timesheet_btn = gr.Button(
-                    "Hidden Timesheet",
-                    elem_id="hidden-timesheet-btn",
-                    elem_classes=["hidden-button"],
-                    visible=False
+                    "⏰\nTimesheet Management\nManage Oracle and Mars timesheets with AI assistance",
+                    elem_id="timesheet-tile",
+                    elem_classes=["service-tile", "service-tile-timesheet"]
                 )
-                timesheet_btn.elem_id = "hidden-timesheet-btn"
-                timesheet_btn.elem_classes = ["hidden-button"]
 
                 hr_policy_btn = gr.Button(
-                    "Hidden HR Policy",
-                    elem_id="hidden-hr-policy-btn", 
-                    elem_classes=["hidden-button"],
-                    visible=False
+                    "📋\nHR Policy Assistant\nGet answers about policies and HR documents",
+                    elem_id="hr-policy-tile",
+                    elem_classes=["service-tile", "service-tile-hr-policy"]
                 )
-                hr_policy_btn.elem_id = "hidden-hr-policy-btn"
-                hr_policy_btn.elem_classes = ["hidden-button"]
+
+            gr.HTML(WELCOME_FOOTER_HTML)
+
+            # Hidden email field with auto-detected username 
+            email_input = gr.Textbox(
+                value=DEFAULT_EMAIL,
+                visible=False
+            )
 
         # Chat Interface - EXACT SAME as original
         with gr.Group(visible=False) as chat_interface:
@@ -681,36 +811,36 @@ def create_no_duplicate_interface():
 
         # Event handlers with EXACT SAME logic as original - NO DUPLICATES
         timesheet_btn.click(
-            fn=lambda email, state: select_service("timesheet", email, state),
-            inputs=[email_input, state],
-            outputs=[welcome_screen, chat_interface, chat_display, msg_input, send_btn, status_display, state]
+            fn=lambda email, session_id: select_service("timesheet", email, session_id),
+            inputs=[email_input, session_id],
+            outputs=[welcome_screen, chat_interface, chat_display, msg_input, send_btn, status_display]
         )
 
         hr_policy_btn.click(
-            fn=lambda email, state: select_service("hr_policy", email, state),
-            inputs=[email_input, state], 
-            outputs=[welcome_screen, chat_interface, chat_display, msg_input, send_btn, status_display, state]
+            fn=lambda email, session_id: select_service("hr_policy", email, session_id),
+            inputs=[email_input, session_id], 
+            outputs=[welcome_screen, chat_interface, chat_display, msg_input, send_btn, status_display]
         )
 
         # Send message with EXACT SAME streaming-like effect as original
         send_btn.click(
             fn=send_message,
-            inputs=[msg_input, state],
-            outputs=[chat_display, msg_input, status_display, state]
+            inputs=[msg_input, session_id],
+            outputs=[chat_display, msg_input, status_display]
         )
 
         # Enter key support - EXACT SAME as original
         msg_input.submit(
             fn=send_message,
-            inputs=[msg_input, state],
-            outputs=[chat_display, msg_input, status_display, state]
+            inputs=[msg_input, session_id],
+            outputs=[chat_display, msg_input, status_display]
         )
 
         # Reset conversation - EXACT SAME as original
         reset_btn.click(
             fn=reset_conversation,
-            inputs=[state],
-            outputs=[welcome_screen, chat_interface, welcome_display, msg_input, send_btn, status_display, state]
+            inputs=[session_id],
+            outputs=[welcome_screen, chat_interface, welcome_display, msg_input, send_btn, status_display]
         )
 
         # Add footer - EXACT SAME as original
@@ -726,7 +856,7 @@ def create_no_duplicate_interface():
 # 🚀 Launch the application
 if __name__ == "__main__":
     print("🤖 Starting Enterprise Assistant - NO DUPLICATE TILES...")
-    print(f"👤 Detected user: {get_windows_username()}")
+    print(f"👤 Detected user: {WINDOWS_USERNAME}")
     print("✨ Features:")
     print("   ✅ Auto Windows username detection")
     print("   🎯 SINGLE set of clickable service areas (NO DUPLICATES)") 
@@ -740,6 +870,9 @@ if __name__ == "__main__":
     # Create and launch the app
     app = create_no_duplicate_interface()
 
+    # send_message is I/O-bound, so let many chat turns share the event loop
+    app.queue(default_concurrency_limit=32, max_size=256)
+
     app.launch(
         server_name="0.0.0.0",
         server_port=7860,
@@ -7,19 +7,37 @@
 """
 
 import gradio as gr
-import requests
+import aiohttp
 import json
+import orjson
 import asyncio
+import atexit
 import time
 import os
 import getpass
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Tuple, List, Dict, Any
 import logging
+import re
+import types
+
+# Optional: semantic matching in the response cache (exact-match caching works without it)
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Per-request INFO records are noise in production - drop them before they're built
+if os.environ.get("ENV") == "production":
+    logger.setLevel(logging.WARNING)
 
 # 🎯 API Configuration - Perfectly Aligned with Fixed APIs
 API_CONFIG = {
@@ -30,7 +48,8 @@ API_CONFIG = {
         "name": "Timesheet Management",
         "description": "Manage your Oracle and Mars timesheets with AI assistance",
         "icon": "⏰",
-        "color": "#0066cc"
+        "color": "#0066cc",
+        "cache_responses": False  # Stateful conversation that can write entries - never cached
     },
     "hr_policy": {
         "base_url": "http://localhost:8001", 
@@ -39,175 +58,378 @@ API_CONFIG = {
         "name": "HR Policy Assistant",
         "description": "Get answers about company policies and HR documents", 
         "icon": "📋",
-        "color": "#7c3aed"
+        "color": "#7c3aed",
+        "cache_responses": True
     }
 }
 
+# Request shape per service - timesheet needs the user's email, HR policy only the question
+_PAYLOAD_BUILDERS = {
+    "timesheet": lambda message, email: {"email": email, "user_prompt": message},
+    "hr_policy": lambda message, email: {"question": message}
+}
+
+# Derived fields (full URL, lowercase name for running text), then freeze each config
+for _service, _config in API_CONFIG.items():
+    _config["url"] = _config["base_url"] + _config["endpoint"]
+    _config["name_lower"] = _config["name"].lower()
+    _config["build_payload"] = _PAYLOAD_BUILDERS[_service]
+API_CONFIG = {service: types.MappingProxyType(config) for service, config in API_CONFIG.items()}
+
+def detect_windows_username():
+    """Detect the current Windows username"""
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "user"
+
+# The logged-in user doesn't change for the life of the process
+WINDOWS_USERNAME = detect_windows_username()
+DEFAULT_EMAIL = f"{WINDOWS_USERNAME}@company.com"
+
+# Service welcome message template - filled per service below
+SERVICE_WELCOME_TEMPLATE = """Hello **{username}**! I'm your **{name}** assistant.
+
+{description}
+
+I'm ready to help you with {name_lower}. What would you like to do today?
+
+You can ask me questions, get help, or start working with your {name_lower}."""
+
+SERVICE_WELCOME_MESSAGES = {
+    service: SERVICE_WELCOME_TEMPLATE.format(username=WINDOWS_USERNAME, **config)
+    for service, config in API_CONFIG.items()
+}
+
+# Chat rows kept (and sent to the browser) per session; older rows drop out of the visible window
+MAX_HISTORY_ROWS = 50
+
+def new_history() -> deque:
+    """Empty bounded chat history for a session"""
+    return deque(maxlen=MAX_HISTORY_ROWS)
+
+@dataclass(slots=True)
 class ChatState:
     """Enhanced chat state management with ChatGPT-like features"""
-    def __init__(self):
-        self.selected_service = None
-        # Auto-detect Windows username
-        self.user_email = f"{getpass.getuser()}@company.com"  # Auto Windows username
-        self.conversation_history = []
-        self.is_initialized = False
-        self.session_start = datetime.now()
-        self.message_count = 0
+    selected_service: Optional[str] = None
+    user_email: str = ""  # Filled with the Windows login when a service is selected
+    conversation_history: deque = field(default_factory=new_history)
+    is_initialized: bool = False
+    session_start: Optional[datetime] = None  # Set on the first message
+    message_count: int = 0
+    # Questions waiting out the coalescing window, the task that will send them and the row its answer goes in
+    pending_messages: List[str] = field(default_factory=list)
+    flush_task: Optional[asyncio.Task] = None
+    batch_placeholder: Optional[list] = None
 
     def reset(self):
         """Reset state for fresh conversation"""
         self.selected_service = None
-        # Keep the auto-detected username
-        self.user_email = f"{getpass.getuser()}@company.com"
-        self.conversation_history = []
+        self.user_email = ""
+        self.conversation_history = new_history()
         self.is_initialized = False
-        self.session_start = datetime.now()
+        self.session_start = None
         self.message_count = 0
+        self.pending_messages = []
+        self.flush_task = None
+        self.batch_placeholder = None
 
 def get_windows_username():
-    """Get current Windows username"""
-    try:
-        return getpass.getuser()
-    except Exception:
-        return "user"
-
-async def call_api(service: str, message: str, email: str = None) -> Dict[str, Any]:
-    """Enhanced API calling with proper error handling"""
-    try:
-        config = API_CONFIG[service]
-        url = f"{config['base_url']}{config['endpoint']}"
-
-        # Prepare payload based on service type
-        if service == "timesheet":
-            payload = {
-                "email": email,
-                "user_prompt": message
-            }
-        else:  # hr_policy
-            payload = {
-                "question": message
-            }
-
-        logger.info(f"Calling {service} API: {url}")
-
-        response = requests.post(
-            url,
-            json=payload,
+    """Get current Windows username (detected once at import)"""
+    return WINDOWS_USERNAME
+
+# Shared HTTP session - created on first use inside Gradio's event loop, reused for every call
+_HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use"""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None or _HTTP_SESSION.closed:
+        _HTTP_SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=32, keepalive_timeout=60),
             headers={
                 "Content-Type": "application/json",
                 "Accept": "application/json"
             },
-            timeout=30
+            timeout=aiohttp.ClientTimeout(total=30)
         )
+    return _HTTP_SESSION
+
+def close_http_session():
+    """Close the shared aiohttp session on interpreter shutdown"""
+    if _HTTP_SESSION is not None and not _HTTP_SESSION.closed:
+        try:
+            asyncio.run(_HTTP_SESSION.close())
+        except Exception:
+            pass
+
+atexit.register(close_http_session)
+
+SEMANTIC_MODEL_NAME = "all-MiniLM-L6-v2"
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """Load the sentence-transformer used for semantic cache lookups (once)"""
+    return SentenceTransformer(SEMANTIC_MODEL_NAME)
+
+class ResponseCache:
+    """LRU cache of API answers keyed on (service, normalized question), with optional semantic matching"""
+    def __init__(self, max_entries: int = 512, similarity_threshold: float = 0.9):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        # (service, normalized question) -> (api_result, normalized embedding or None)
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Lowercase and collapse whitespace so trivial variations share a key"""
+        return " ".join(message.lower().split())
+
+    @staticmethod
+    def embed(text: str):
+        """Return a unit-length embedding, or None when sentence-transformers is not installed"""
+        if SentenceTransformer is None:
+            return None
+        return get_embedding_model().encode(text, normalize_embeddings=True)
+
+    async def lookup(self, service: str, message: str) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """Return (cached result or None, query embedding) for a question"""
+        key = (service, self.normalize(message))
+        hit = self.entries.get(key)
+        if hit is not None:
+            self.entries.move_to_end(key)
+            return hit[0], hit[1]
+
+        # Encoding is CPU-bound, keep it off the event loop
+        query_embedding = await asyncio.to_thread(self.embed, key[1])
+        if query_embedding is None:
+            return None, None
+
+        candidates = [(k, v) for k, v in self.entries.items() if k[0] == service and v[1] is not None]
+        if not candidates:
+            return None, query_embedding
+
+        scores = np.dot(np.stack([v[1] for _, v in candidates]), query_embedding)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            best_key, (result, _) = candidates[best]
+            self.entries.move_to_end(best_key)
+            return result, query_embedding
+        return None, query_embedding
+
+    def store(self, service: str, message: str, result: Dict[str, Any], embedding=None):
+        """Cache a result, evicting the least recently used entry when full"""
+        key = (service, self.normalize(message))
+        self.entries[key] = (result, embedding)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+response_cache = ResponseCache()
+
+# Footer appended to HR policy answers that cite documents
+SOURCES_PREFIX = "\n\n📚 **Sources:** "
 
-        if response.status_code == 200:
-            data = response.json()
-            logger.info(f"✅ {service} API responded successfully")
+async def call_api(service: str, message: str, email: str = None) -> Dict[str, Any]:
+    """Call a service API, answering repeated or paraphrased questions from the cache when allowed"""
+    if not API_CONFIG[service].get("cache_responses"):
+        return await fetch_api(service, message, email)
 
-            # Handle different response formats
-            if service == "timesheet":
-                return {
-                    "success": True,
-                    "message": data.get("response", data.get("message", "Response received successfully.")),
-                    "data": data.get("data", {})
-                }
-            else:  # hr_policy
-                answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
-                sources = data.get("sources", [])
-                if sources:
-                    answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
+    cached, embedding = await response_cache.lookup(service, message)
+    if cached is not None:
+        logger.info("♻️ %s answer served from cache", service)
+        return cached
+
+    result = await fetch_api(service, message, email)
+    if result["success"]:
+        response_cache.store(service, message, result, embedding)
+    return result
+
+async def fetch_api(service: str, message: str, email: str = None) -> Dict[str, Any]:
+    """Enhanced API calling with proper error handling"""
+    try:
+        config = API_CONFIG[service]
+        url = config["url"]
+        payload = config["build_payload"](message, email)
+
+        logger.info("Calling %s API: %s", service, url)
+
+        session = await get_http_session()
+        # orjson encodes to bytes; the session already sends Content-Type: application/json
+        async with session.post(url, data=orjson.dumps(payload)) as response:
+            if response.status == 200:
+                data = orjson.loads(await response.read())
+                logger.info("✅ %s API responded successfully", service)
+
+                # Handle different response formats
+                if service == "timesheet":
+                    return {
+                        "success": True,
+                        "message": data.get("response", data.get("message", "Response received successfully.")),
+                        "data": data.get("data", {})
+                    }
+                else:  # hr_policy
+                    answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
+                    sources = data.get("sources", [])
+                    if sources:
+                        answer = "".join((answer, SOURCES_PREFIX, ", ".join(sources)))
+                    return {
+                        "success": True,
+                        "message": answer,
+                        "data": {"sources": sources}
+                    }
+            else:
+                logger.error("❌ API Error: %s", response.status)
                 return {
-                    "success": True,
-                    "message": answer,
-                    "data": {"sources": sources}
+                    "success": False,
+                    "message": f"API Error ({response.status}): Please check if the service is running.",
+                    "data": {}
                 }
-        else:
-            logger.error(f"❌ API Error: {response.status_code}")
-            return {
-                "success": False,
-                "message": f"API Error ({response.status_code}): Please check if the service is running.",
-                "data": {}
-            }
-
-    except requests.exceptions.ConnectionError:
-        logger.error(f"❌ Connection error to {service} API")
+
+    except aiohttp.ClientConnectorError:
+        logger.error("❌ Connection error to %s API", service)
         return {
             "success": False,
             "message": f"🔌 Cannot connect to {config['name']} service. Please ensure the API server is running on {config['base_url']}.",
             "data": {}
         }
     except Exception as e:
-        logger.error(f"❌ Unexpected error: {str(e)}")
+        logger.error("❌ Unexpected error: %s", e)
         return {
             "success": False,
             "message": f"❌ An unexpected error occurred: {str(e)}",
             "data": {}
         }
 
+# 🔮 Follow-up prefetch - answer likely next HR questions in the background so they come from the cache
+# Opt-in: the extra questions share the single local model with real users
+PREFETCH_FOLLOW_UPS = os.getenv("PREFETCH_FOLLOW_UPS", "0") == "1"
+MAX_PREFETCH_IN_FLIGHT = 4  # Across all sessions, so prefetching can't swamp the backend
+FOLLOW_UP_TEMPLATES = (
+    "Who is eligible for {topic}?",
+    "How do I apply for {topic}?",
+    "What documents are needed for {topic}?"
+)
+QUESTION_LEAD_PATTERN = re.compile(
+    r"^(?:what|how|who|when|where|why|which|can|could|do|does|is|are|should|tell me)\b"
+    r"(?:\s+(?:is|are|do|does|the|a|an|about|i|we|my|our|many|much|to|get|take)\b)*\s*",
+    re.IGNORECASE
+)
+_prefetch_tasks = set()
+
+def follow_up_questions(message: str) -> List[str]:
+    """Guess plausible next questions from the topic of an HR question"""
+    topic = QUESTION_LEAD_PATTERN.sub("", message.strip().rstrip("?.! "))
+    if not topic:
+        return []
+    return [template.format(topic=topic) for template in FOLLOW_UP_TEMPLATES]
+
+def schedule_prefetch(message: str):
+    """Start background HR calls for likely follow-ups, within the in-flight cap"""
+    if not PREFETCH_FOLLOW_UPS:
+        return
+    available = MAX_PREFETCH_IN_FLIGHT - len(_prefetch_tasks)
+    for question in follow_up_questions(message)[:max(available, 0)]:
+        # call_api checks the cache first and stores successful answers
+        task = asyncio.create_task(call_api("hr_policy", question))
+        _prefetch_tasks.add(task)
+        task.add_done_callback(_prefetch_tasks.discard)
+
 def select_service(service: str, state: ChatState) -> Tuple[str, str, gr.update, gr.update, ChatState]:
     """Handle service selection directly with Windows username"""
 
     # Update state with auto-detected user
     state.selected_service = service
+    state.user_email = DEFAULT_EMAIL
     state.is_initialized = True
-    state.conversation_history = []
-
-    # Get service configuration
-    config = API_CONFIG[service]
-    username = get_windows_username()
+    state.conversation_history.clear()
 
     # Create service welcome message
-    service_welcome = f"""Hello **{username}**! I'm your **{config['name']}** assistant.
-
-{config['description']}
-
-I'm ready to help you with {config['name'].lower()}. What would you like to do today?
-
-You can ask me questions, get help, or start working with your {config['name'].lower()}."""
+    service_welcome = SERVICE_WELCOME_MESSAGES[service]
 
     # Add to conversation history
     state.conversation_history.append([None, service_welcome])
 
     return (
-        state.conversation_history,  # chatbot
+        list(state.conversation_history),  # chatbot
         "",  # message input (clear)
         gr.update(visible=False),  # hide service selection
         gr.update(visible=True),   # show chat interface
         state
     )
 
-async def send_message(message: str, history: List, state: ChatState) -> Tuple[List, str]:
-    """Send message with ChatGPT-style processing"""
-
-    if not message.strip() or not state.is_initialized:
-        return history, ""
+# Questions sent within this window of each other go to the backend as one request
+COALESCE_WINDOW_SECONDS = 0.15
+
+async def flush_pending(state: ChatState) -> Tuple[Dict[str, Any], List[str]]:
+    """Wait out the coalescing window, then send every queued question in one call"""
+    await asyncio.sleep(COALESCE_WINDOW_SECONDS)
+    messages, state.pending_messages = state.pending_messages, []
+    # Anything sent from here on starts a new batch
+    state.flush_task = None
+    state.batch_placeholder = None
+    api_result = await call_api(state.selected_service, "\n\n".join(messages), state.user_email)
+    return api_result, messages
+
+async def send_message(message: str, state: ChatState):
+    """Send message with ChatGPT-style processing - async generator, placeholder first then answer"""
+
+    # Rows live in the session's bounded deque (the browser never uploads them); Gradio gets a list copy
+    history = state.conversation_history
+
+    if not message or message.isspace() or not state.is_initialized:
+        yield list(history), ""
+        return
+
+    if state.session_start is None:
+        state.session_start = datetime.now()
+
+    # Timesheet requests change data, so each one is sent on its own
+    coalesce = state.selected_service != "timesheet"
+    if coalesce and state.flush_task is not None:
+        # A batch is still collecting - this question is answered in that batch's reply,
+        # so its row goes directly above the batch's placeholder (matched by identity, rows can be equal)
+        state.pending_messages.append(message)
+        if len(history) == history.maxlen:
+            history.popleft()
+        index = next((i for i, row in enumerate(history) if row is state.batch_placeholder), len(history))
+        history.insert(index, [message, None])
+        yield list(history), ""
+        return
 
     # Add user message to history
     history.append([message, None])
 
-    # Add typing placeholder
-    history.append([None, "🤖 Assistant is thinking..."])
+    # Add typing placeholder and push it to the UI before the backend call
+    placeholder = [None, "🤖 Assistant is thinking..."]
+    history.append(placeholder)
+    yield list(history), ""
 
     try:
         # Call API
-        api_result = await call_api(state.selected_service, message, state.user_email)
-
-        if api_result["success"]:
-            response = api_result["message"]
+        if coalesce:
+            state.pending_messages.append(message)
+            state.batch_placeholder = placeholder
+            state.flush_task = asyncio.create_task(flush_pending(state))
+            api_result, messages = await state.flush_task
         else:
-            response = api_result["message"]
+            api_result = await call_api(state.selected_service, message, state.user_email)
+            messages = [message]
+
+        # Errors come back as a user-facing message too
+        response = api_result["message"]
 
         # Replace typing indicator with actual response
-        history[-1] = [None, response]
+        placeholder[1] = response
 
-        # Update state
-        state.conversation_history = history
+        if state.selected_service == "hr_policy" and api_result["success"]:
+            schedule_prefetch(messages[-1])
 
     except Exception as e:
         response = f"I apologize, but I encountered an unexpected error: {str(e)}\n\nPlease try again or check if the service is running."
-        history[-1] = [None, response]
+        placeholder[1] = response
 
-    return history, ""
+    yield list(history), ""
 
 def reset_conversation(state: ChatState) -> Tuple[List, gr.update, gr.update, ChatState]:
     """Reset to service selection"""
@@ -222,28 +444,30 @@ def reset_conversation(state: ChatState) -> Tuple[List, gr.update, gr.update, Ch
         state
     )
 
+# Service selection screen text - static for the life of the process
+WELCOME_MARKDOWN = f"""
+# 🏢 Enterprise Assistant
+### Welcome, **{WINDOWS_USERNAME}**!
+
+Your AI-powered workspace companion is ready to help.
+Please select a service to get started:
+"""
+
+SERVICE_CARD_LABELS = {
+    service: f"{config['icon']} **{config['name']}**\n\n{config['description']}"
+    for service, config in API_CONFIG.items()
+}
+
 def create_service_selection_interface():
     """Create centered service selection interface"""
 
-    username = get_windows_username()
-
     with gr.Column(elem_id="service-selection", elem_classes=["service-container"]):
-        gr.Markdown(f"""
-        # 🏢 Enterprise Assistant
-        ### Welcome, **{username}**!
-
-        Your AI-powered workspace companion is ready to help.
-        Please select a service to get started:
-        """, elem_classes=["welcome-header"])
+        gr.Markdown(WELCOME_MARKDOWN, elem_classes=["welcome-header"])
 
         with gr.Row(elem_classes=["service-row"]):
             # Timesheet Management Card
             timesheet_btn = gr.Button(
-                """
-                ⏰ **Timesheet Management**
-
-                Manage your Oracle and Mars timesheets with AI assistance
-                """,
+                SERVICE_CARD_LABELS["timesheet"],
                 elem_id="timesheet-service",
                 elem_classes=["service-card", "timesheet-card"],
                 size="lg"
@@ -251,11 +475,7 @@ def create_service_selection_interface():
 
             # HR Policy Assistant Card  
             hr_policy_btn = gr.Button(
-                """
-                📋 **HR Policy Assistant**
-
-                Get answers about company policies and HR documents
-                """,
+                SERVICE_CARD_LABELS["hr_policy"],
                 elem_id="hr-policy-service", 
                 elem_classes=["service-card", "hr-policy-card"],
                 size="lg"
@@ -266,135 +486,138 @@ def create_service_selection_interface():
 
     return timesheet_btn, hr_policy_btn
 
-# 🎨 Create the main ChatGPT-style interface
-def create_enterprise_interface():
-    """Create the main enterprise ChatGPT-style interface"""
+# Custom CSS for professional styling with centered cards
+CUSTOM_CSS = """
+/* Enterprise ChatGPT Style - Centered Service Cards */
+.gradio-container {
+    max-width: 1000px !important;
+    margin: 0 auto !important;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
+}
 
-    # Custom CSS for professional styling with centered cards
-    custom_css = """
-    /* Enterprise ChatGPT Style - Centered Service Cards */
-    .gradio-container {
-        max-width: 1000px !important;
-        margin: 0 auto !important;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
-    }
+.service-container {
+    display: flex !important;
+    flex-direction: column !important;
+    align-items: center !important;
+    justify-content: center !important;
+    min-height: 70vh !important;
+    padding: 2rem !important;
+}
 
-    .service-container {
-        display: flex !important;
-        flex-direction: column !important;
-        align-items: center !important;
-        justify-content: center !important;
-        min-height: 70vh !important;
-        padding: 2rem !important;
-    }
+.welcome-header {
+    text-align: center !important;
+    margin-bottom: 3rem !important;
+}
 
-    .welcome-header {
-        text-align: center !important;
-        margin-bottom: 3rem !important;
-    }
+.service-row {
+    display: flex !important;
+    gap: 2rem !important;
+    justify-content: center !important;
+    align-items: stretch !important;
+    max-width: 800px !important;
+    width: 100% !important;
+}
 
-    .service-row {
-        display: flex !important;
-        gap: 2rem !important;
-        justify-content: center !important;
-        align-items: stretch !important;
-        max-width: 800px !important;
-        width: 100% !important;
-    }
+.service-card {
+    flex: 1 !important;
+    min-height: 200px !important;
+    padding: 2rem !important;
+    border-radius: 16px !important;
+    border: 2px solid #e1e5e9 !important;
+    background: linear-gradient(135deg, #ffffff 0%, #f8f9fa 100%) !important;
+    box-shadow: 0 4px 20px rgba(0, 0, 0, 0.1) !important;
+    transition: all 0.3s ease !important;
+    cursor: pointer !important;
+    text-align: center !important;
+    font-size: 1.1rem !important;
+    font-weight: 500 !important;
+    white-space: pre-line !important;
+}
 
-    .service-card {
-        flex: 1 !important;
-        min-height: 200px !important;
-        padding: 2rem !important;
-        border-radius: 16px !important;
-        border: 2px solid #e1e5e9 !important;
-        background: linear-gradient(135deg, #ffffff 0%, #f8f9fa 100%) !important;
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.1) !important;
-        transition: all 0.3s ease !important;
-        cursor: pointer !important;
-        text-align: center !important;
-        font-size: 1.1rem !important;
-        font-weight: 500 !important;
-        white-space: pre-line !important;
-    }
+.service-card:hover {
+    transform: translateY(-4px) !important;
+    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.15) !important;
+    border-color: #0066cc !important;
+}
 
-    .service-card:hover {
-        transform: translateY(-4px) !important;
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.15) !important;
-        border-color: #0066cc !important;
-    }
+.timesheet-card:hover {
+    border-color: #0066cc !important;
+    background: linear-gradient(135deg, #e3f2fd 0%, #ffffff 100%) !important;
+}
 
-    .timesheet-card:hover {
-        border-color: #0066cc !important;
-        background: linear-gradient(135deg, #e3f2fd 0%, #ffffff 100%) !important;
-    }
+.hr-policy-card:hover {
+    border-color: #7c3aed !important;
+    background: linear-gradient(135deg, #f3e8ff 0%, #ffffff 100%) !important;
+}
 
-    .hr-policy-card:hover {
-        border-color: #7c3aed !important;
-        background: linear-gradient(135deg, #f3e8ff 0%, #ffffff 100%) !important;
-    }
+.security-note {
+    text-align: center !important;
+    color: #6b7280 !important;
+    font-size: 0.9rem !important;
+    margin-top: 2rem !important;
+}
 
-    .security-note {
-        text-align: center !important;
-        color: #6b7280 !important;
-        font-size: 0.9rem !important;
-        margin-top: 2rem !important;
-    }
+/* Chat Interface Styling */
+.chat-interface {
+    min-height: 600px !important;
+}
 
-    /* Chat Interface Styling */
-    .chat-interface {
-        min-height: 600px !important;
-    }
+.chatbot {
+    border-radius: 12px !important;
+    border: 1px solid #e1e5e9 !important;
+}
 
-    .chatbot {
-        border-radius: 12px !important;
-        border: 1px solid #e1e5e9 !important;
-    }
+.message-input {
+    border-radius: 12px !important;
+    border: 1px solid #d1d5db !important;
+    font-size: 16px !important;
+    padding: 12px 16px !important;
+}
 
-    .message-input {
-        border-radius: 12px !important;
-        border: 1px solid #d1d5db !important;
-        font-size: 16px !important;
-        padding: 12px 16px !important;
-    }
+.message-input:focus {
+    border-color: #0066cc !important;
+    box-shadow: 0 0 0 3px rgba(0, 102, 204, 0.1) !important;
+}
 
-    .message-input:focus {
-        border-color: #0066cc !important;
-        box-shadow: 0 0 0 3px rgba(0, 102, 204, 0.1) !important;
-    }
+.send-button, .reset-button {
+    border-radius: 8px !important;
+    font-weight: 600 !important;
+    padding: 12px 24px !important;
+}
 
-    .send-button, .reset-button {
-        border-radius: 8px !important;
-        font-weight: 600 !important;
-        padding: 12px 24px !important;
-    }
+.send-button {
+    background: #0066cc !important;
+}
 
-    .send-button {
-        background: #0066cc !important;
+.reset-button {
+    background: #dc3545 !important;
+}
+
+/* Responsive Design */
+@media (max-width: 768px) {
+    .service-row {
+        flex-direction: column !important;
+        gap: 1rem !important;
     }
 
-    .reset-button {
-        background: #dc3545 !important;
+    .service-card {
+        min-height: 150px !important;
+        padding: 1.5rem !important;
     }
 
-    /* Responsive Design */
-    @media (max-width: 768px) {
-        .service-row {
-            flex-direction: column !important;
-            gap: 1rem !important;
-        }
+    .service-container {
+        padding: 1rem !important;
+        min-height: 60vh !important;
+    }
+}
+"""
 
-        .service-card {
-            min-height: 150px !important;
-            padding: 1.5rem !important;
-        }
+# Browsers don't need the indentation - collapse whitespace once to shrink every page load
+CUSTOM_CSS_MINIFIED = re.sub(r"\s+", " ", CUSTOM_CSS).strip()
 
-        .service-container {
-            padding: 1rem !important;
-            min-height: 60vh !important;
-        }
-    }
-    """
+# 🎨 Create the main ChatGPT-style interface
+def create_enterprise_interface():
+    """Create the main enterprise ChatGPT-style interface"""
 
     with gr.Blocks(
         title="🏢 Enterprise Assistant - Auto Login",
@@ -404,12 +627,12 @@ def create_enterprise_interface():
             neutral_hue="gray",
             font=gr.themes.GoogleFont("Inter")
         ),
-        css=custom_css,
+        css=CUSTOM_CSS_MINIFIED,
         fill_height=True
     ) as app:
 
-        # Application state
-        state = gr.State(ChatState())
+        # Application state - Gradio calls the factory once per browser session
+        state = gr.State(value=ChatState)
 
         # Service Selection Interface (Visible by default)
         with gr.Group(visible=True) as service_selection:
@@ -454,8 +677,7 @@ def create_enterprise_interface():
                 )
 
                 # Show current user info
-                username = get_windows_username()
-                gr.Markdown(f"**Logged in as:** {username}", elem_classes=["user-info"])
+                gr.Markdown(f"**Logged in as:** {WINDOWS_USERNAME}", elem_classes=["user-info"])
 
         # Event Handlers
 
@@ -475,17 +697,23 @@ def create_enterprise_interface():
         # Send Message
         send_btn.click(
             fn=send_message,
-            inputs=[msg_input, chatbot, state],
+            inputs=[msg_input, state],
             outputs=[chatbot, msg_input],
-            show_progress=True
+            show_progress=True,
+            api_name=False,
+            trigger_mode="multiple",  # Let quick follow-ups in while a batch is collecting
+            concurrency_limit=None
         )
 
         # Enter Key Support
         msg_input.submit(
             fn=send_message,
-            inputs=[msg_input, chatbot, state],
+            inputs=[msg_input, state],
             outputs=[chatbot, msg_input],
-            show_progress=True
+            show_progress=True,
+            api_name=False,
+            trigger_mode="multiple",  # Let quick follow-ups in while a batch is collecting
+            concurrency_limit=None
         )
 
         # Reset to Service Selection
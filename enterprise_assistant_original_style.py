@@ -7,18 +7,32 @@
 """
 
 import gradio as gr
-import requests
+import aiohttp
 import json
+import orjson
 import asyncio
+import atexit
 import time
 import os
 import getpass
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Tuple, List, Dict, Any
 import logging
+import re
+
+# Optional: semantic cache for HR policy answers (disabled when these aren't installed)
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())  # INFO logs every API call
 logger = logging.getLogger(__name__)
 
 # 🎯 API Configuration - Perfectly Aligned with Fixed APIs
@@ -43,35 +57,214 @@ API_CONFIG = {
     }
 }
 
+def detect_windows_username():
+    """Detect the current Windows username"""
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "user"
+
+# The logged-in user doesn't change for the life of the process
+WINDOWS_USERNAME = detect_windows_username()
+DEFAULT_EMAIL = f"{WINDOWS_USERNAME}@company.com"
+
+# Message timestamps only show the minute, so format once per minute
+_TIME_LABEL_CACHE = [-1, ""]
+
+def current_time_label() -> str:
+    """Return the current time as e.g. '02:35 PM', reformatted only when the minute changes"""
+    minute = int(time.time()) // 60
+    if minute != _TIME_LABEL_CACHE[0]:
+        _TIME_LABEL_CACHE[0] = minute
+        _TIME_LABEL_CACHE[1] = datetime.now().strftime("%I:%M %p")
+    return _TIME_LABEL_CACHE[1]
+
+# Messages kept (and rendered) per session; older ones scroll out of the window
+MAX_WINDOW_MESSAGES = 20
+
+@dataclass(slots=True)
+class ChatMessage:
+    """One entry in a session's conversation history"""
+    role: str
+    content: str
+    timestamp: str
+    service: Optional[str] = None
+
 class ChatState:
     """Enhanced chat state management with ChatGPT-like features"""
+    __slots__ = (
+        "selected_service", "user_email", "conversation_history", "rendered_bubbles",
+        "is_initialized", "session_start", "message_count",
+        "prefetch_future", "prefetch_prompt", "typing_seq"
+    )
+
     def __init__(self):
         self.selected_service = None
         # Auto-detect Windows username
-        self.user_email = f"{getpass.getuser()}@company.com"  # Auto Windows username
-        self.conversation_history = []
+        self.user_email = DEFAULT_EMAIL  # Auto Windows username
+        self.conversation_history = deque(maxlen=MAX_WINDOW_MESSAGES)
+        # Rendered bubble per message in the window, appended to as messages arrive
+        self.rendered_bubbles = deque(maxlen=MAX_WINDOW_MESSAGES)
         self.is_initialized = False
         self.session_start = datetime.now()
         self.message_count = 0
+        # HR answer started while the user paused typing, and the text it was started for
+        self.prefetch_future = None
+        self.prefetch_prompt = ""
+        self.typing_seq = 0
+
+    def render(self) -> str:
+        """Chat HTML for the messages in the window"""
+        return "".join(self.rendered_bubbles)
 
     def reset(self):
         """Reset state for fresh conversation"""
         self.selected_service = None
         # Keep the auto-detected username
-        self.user_email = f"{getpass.getuser()}@company.com"
-        self.conversation_history = []
+        self.user_email = DEFAULT_EMAIL
+        self.conversation_history = deque(maxlen=MAX_WINDOW_MESSAGES)
+        # Rendered bubble per message in the window, appended to as messages arrive
+        self.rendered_bubbles = deque(maxlen=MAX_WINDOW_MESSAGES)
         self.is_initialized = False
         self.session_start = datetime.now()
         self.message_count = 0
+        # HR answer started while the user paused typing, and the text it was started for
+        self.prefetch_future = None
+        self.prefetch_prompt = ""
+        self.typing_seq = 0
 
 def get_windows_username():
-    """Get current Windows username"""
-    try:
-        return getpass.getuser()
-    except Exception:
-        return "user"
+    """Get current Windows username (detected once at import)"""
+    return WINDOWS_USERNAME
+
+# Shared HTTP session - created on first use inside Gradio's event loop, reused for every call
+_HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use"""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None or _HTTP_SESSION.closed:
+        _HTTP_SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=20, keepalive_timeout=60),
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            },
+            timeout=aiohttp.ClientTimeout(total=30, connect=5)
+        )
+    return _HTTP_SESSION
 
-async def call_api(service: str, message: str, email: str = None) -> Dict[str, Any]:
+def close_http_session():
+    """Close the shared aiohttp session on interpreter shutdown"""
+    if _HTTP_SESSION is not None and not _HTTP_SESSION.closed:
+        try:
+            asyncio.run(_HTTP_SESSION.close())
+        except Exception:
+            pass
+
+atexit.register(close_http_session)
+
+_POOL_WARMED = False
+
+async def warm_up_connections():
+    """Open a keep-alive connection to each backend (concurrently) so the first chat skips the handshake"""
+    global _POOL_WARMED
+    if _POOL_WARMED:
+        return
+    _POOL_WARMED = True
+    session = await get_http_session()
+
+    async def touch(base_url: str):
+        # Any status will do - the point is the pooled socket
+        async with session.head(f"{base_url}/"):
+            pass
+
+    await asyncio.gather(
+        *(touch(config["base_url"]) for config in API_CONFIG.values()),
+        return_exceptions=True
+    )
+
+SEMANTIC_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """Load the sentence-transformer used for semantic cache lookups (once)"""
+    return SentenceTransformer(SEMANTIC_MODEL_NAME)
+
+class SemanticCache:
+    """Answers keyed by question embedding; a lookup is one matrix-vector product over all entries"""
+    def __init__(self, max_entries: int = 10000, similarity_threshold: float = 0.9):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = None  # (max_entries, D) float32, allocated on first store
+        self.results: List[Dict[str, Any]] = []
+        self.last_used = None  # Per-slot use counter for LRU eviction
+        self.clock = 0
+
+    @staticmethod
+    def embed(message: str):
+        """Unit-length float32 embedding of a question"""
+        return get_embedding_model().encode(message, normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, embedding) -> Optional[Dict[str, Any]]:
+        """Return the cached result for the most similar question above the threshold"""
+        if not self.results:
+            return None
+        sims = self.embeddings[:len(self.results)] @ embedding
+        best = int(sims.argmax())
+        if sims[best] < self.similarity_threshold:
+            return None
+        self.clock += 1
+        self.last_used[best] = self.clock
+        return self.results[best]
+
+    def store(self, embedding, result: Dict[str, Any]):
+        """Cache a result, overwriting the least recently used slot when full"""
+        if self.embeddings is None:
+            self.embeddings = np.empty((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            self.last_used = np.zeros(self.max_entries, dtype=np.int64)
+        if len(self.results) < self.max_entries:
+            slot = len(self.results)
+            self.results.append(result)
+        else:
+            slot = int(self.last_used.argmin())
+            self.results[slot] = result
+        self.embeddings[slot] = embedding
+        self.clock += 1
+        self.last_used[slot] = self.clock
+
+hr_answer_cache = SemanticCache() if SentenceTransformer is not None else None
+
+async def call_api(service: str, message: str, email: str = None, prefetched: asyncio.Task = None) -> Dict[str, Any]:
+    """Call a service API; HR policy answers are reused for semantically similar questions
+
+    ``prefetched`` is an already running ``fetch_api`` task for exactly this message.
+    """
+    # Timesheet replies are per-user and can change data - never cached
+    if service == "timesheet" or hr_answer_cache is None:
+        if prefetched is not None:
+            return await prefetched
+        return await fetch_api(service, message, email)
+
+    # Encoding is CPU-bound, keep it off the event loop
+    embedding = await asyncio.to_thread(hr_answer_cache.embed, message)
+    cached = hr_answer_cache.lookup(embedding)
+    if cached is not None:
+        logger.info("♻️ %s answer served from cache", service)
+        if prefetched is not None:
+            prefetched.cancel()
+        return cached
+
+    # Only submitted questions reach the shared cache - prefetched drafts stay on their own session
+    if prefetched is not None:
+        result = await prefetched
+    else:
+        result = await fetch_api(service, message, email)
+    if result["success"]:
+        hr_answer_cache.store(embedding, result)
+    return result
+
+async def fetch_api(service: str, message: str, email: str = None) -> Dict[str, Any]:
     """Enhanced API calling with proper error handling"""
     try:
         config = API_CONFIG[service]
@@ -88,97 +281,90 @@ async def call_api(service: str, message: str, email: str = None) -> Dict[str, A
                 "question": message
             }
 
-        logger.info(f"Calling {service} API: {url}")
-
-        response = requests.post(
-            url,
-            json=payload,
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            },
-            timeout=30
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            logger.info(f"✅ {service} API responded successfully")
-
-            # Handle different response formats
-            if service == "timesheet":
-                return {
-                    "success": True,
-                    "message": data.get("response", data.get("message", "Response received successfully.")),
-                    "data": data.get("data", {})
-                }
-            else:  # hr_policy
-                answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
-                sources = data.get("sources", [])
-                if sources:
-                    answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
+        logger.info("Calling %s API: %s", service, url)
+
+        session = await get_http_session()
+        # orjson encodes to bytes; the session already sends Content-Type: application/json
+        async with session.post(url, data=orjson.dumps(payload)) as response:
+            if response.status == 200:
+                body = await response.read()
+                if not body:
+                    return {
+                        "success": True,
+                        "message": "Response received successfully.",
+                        "data": {}
+                    }
+                data = orjson.loads(body)
+                logger.debug("✅ %s API responded successfully", service)
+
+                # Handle different response formats
+                if service == "timesheet":
+                    return {
+                        "success": True,
+                        "message": data.get("response", data.get("message", "Response received successfully.")),
+                        "data": data.get("data", {})
+                    }
+                else:  # hr_policy
+                    answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
+                    sources = data.get("sources", [])
+                    if sources:
+                        answer = f"{answer}\n\n📚 **Sources:** {', '.join(sources)}"
+                    return {
+                        "success": True,
+                        "message": answer,
+                        "data": {"sources": sources}
+                    }
+            else:
+                logger.error("❌ API Error: %s", response.status)
                 return {
-                    "success": True,
-                    "message": answer,
-                    "data": {"sources": sources}
+                    "success": False,
+                    "message": f"API Error ({response.status}): Please check if the service is running.",
+                    "data": {}
                 }
-        else:
-            logger.error(f"❌ API Error: {response.status_code}")
-            return {
-                "success": False,
-                "message": f"API Error ({response.status_code}): Please check if the service is running.",
-                "data": {}
-            }
 
-    except requests.exceptions.ConnectionError:
-        logger.error(f"❌ Connection error to {service} API")
+    except aiohttp.ClientConnectorError:
+        logger.error("❌ Connection error to %s API", service)
         return {
             "success": False,
             "message": f"🔌 Cannot connect to {config['name']} service. Please ensure the API server is running on {config['base_url']}.",
             "data": {}
         }
     except Exception as e:
-        logger.error(f"❌ Unexpected error: {str(e)}")
+        logger.error("❌ Unexpected error: %s", e)
         return {
             "success": False,
             "message": f"❌ An unexpected error occurred: {str(e)}",
             "data": {}
         }
 
-def format_chat_message_html(role: str, content: str, timestamp: str = None, service: str = None) -> str:
-    """Format message with EXACT original ChatGPT-style appearance"""
-    if timestamp is None:
-        timestamp = datetime.now().strftime("%I:%M %p")
-
-    if role == "user":
-        return f"""
+# 🧱 Static HTML fragments - API_CONFIG never changes, so these are built once at import
+USER_BUBBLE_OPEN = """
 <div style="display: flex; justify-content: flex-end; margin-bottom: 16px;">
     <div style="background: #0084ff; color: white; padding: 12px 16px; border-radius: 18px 18px 4px 18px; max-width: 70%; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif; font-size: 15px; line-height: 1.4;">
-        {content}
+        """
+USER_BUBBLE_CLOSE = """
     </div>
 </div>"""
-    else:
-        # Assistant message with original ChatGPT styling
-        service_info = ""
-        if service and service in API_CONFIG:
-            config = API_CONFIG[service]
-            service_info = f"""
-            <div style="display: flex; align-items: center; gap: 8px; margin-bottom: 8px; padding-bottom: 8px; border-bottom: 1px solid #e5e7eb;">
-                <span style="font-size: 16px;">{config['icon']}</span>
-                <span style="font-weight: 600; color: {config['color']}; font-size: 14px;">{config['name']}</span>
-            </div>
-            """
 
-        return f"""
+ASSISTANT_BUBBLE_OPEN = """
 <div style="display: flex; justify-content: flex-start; margin-bottom: 16px;">
     <div style="background: #f7f7f8; color: #374151; padding: 16px; border-radius: 18px 18px 18px 4px; max-width: 70%; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif; font-size: 15px; line-height: 1.5; border: 1px solid #e5e7eb;">
-        {service_info}
-        <div style="white-space: pre-wrap;">{content}</div>
+        """
+ASSISTANT_BUBBLE_CLOSE = """</div>
     </div>
 </div>"""
 
-def create_original_typing_indicator() -> str:
-    """Create original ChatGPT-style typing indicator"""
-    return """
+SERVICE_INFO_HTML = {
+    service: f"""
+            <div style="display: flex; align-items: center; gap: 8px; margin-bottom: 8px; padding-bottom: 8px; border-bottom: 1px solid #e5e7eb;">
+                <span style="font-size: 16px;">{config['icon']}</span>
+                <span style="font-weight: 600; color: {config['color']}; font-size: 14px;">{config['name']}</span>
+            </div>
+            """
+    for service, config in API_CONFIG.items()
+}
+
+TYPING_INDICATOR_HTML = """
 <div style="display: flex; justify-content: flex-start; margin-bottom: 16px;">
     <div style="background: #f7f7f8; padding: 16px; border-radius: 18px 18px 18px 4px; border: 1px solid #e5e7eb;">
         <div style="display: flex; align-items: center; gap: 8px;">
@@ -193,17 +379,47 @@ def create_original_typing_indicator() -> str:
 </div>
 """
 
+# HTML-escape message text and turn newlines into <br> in a single pass
+ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+    "\n": "<br>"
+})
+
+def format_chat_message_html(role: str, content: str, timestamp: str = None, service: str = None) -> str:
+    """Format message with EXACT original ChatGPT-style appearance"""
+    if timestamp is None:
+        timestamp = current_time_label()
+
+    content = content.translate(ESCAPE_TABLE)
+
+    if role == "user":
+        return f"{USER_BUBBLE_OPEN}{content}{USER_BUBBLE_CLOSE}"
+    else:
+        # Assistant message with original ChatGPT styling
+        service_info = SERVICE_INFO_HTML.get(service, "")
+        return f"""{ASSISTANT_BUBBLE_OPEN}{service_info}
+        <div>{content}{ASSISTANT_BUBBLE_CLOSE}"""
+
+def create_original_typing_indicator() -> str:
+    """Create original ChatGPT-style typing indicator"""
+    return TYPING_INDICATOR_HTML
+
 def select_service(service: str, state: ChatState) -> Tuple[str, str, gr.update, gr.update, ChatState]:
     """Handle service selection directly with Windows username"""
 
     # Update state with auto-detected user
     state.selected_service = service
     state.is_initialized = True
-    state.conversation_history = []
+    state.conversation_history.clear()
+    state.rendered_bubbles.clear()
 
     # Get service configuration
     config = API_CONFIG[service]
-    username = get_windows_username()
+    username = WINDOWS_USERNAME
 
     # Create service welcome message
     service_welcome = f"""Hello **{username}**! I'm your **{config['name']}** assistant.
@@ -215,24 +431,53 @@ I'm ready to help you with {config['name'].lower()}. What would you like to do t
 You can ask me questions, get help, or start working with your {config['name'].lower()}."""
 
     # Add to conversation history
-    state.conversation_history.append({
-        "role": "assistant",
-        "content": service_welcome,
-        "timestamp": datetime.now().strftime("%I:%M %p"),
-        "service": service
-    })
+    state.conversation_history.append(
+        ChatMessage("assistant", service_welcome, current_time_label(), service)
+    )
 
     # Format with original ChatGPT HTML styling
-    chat_html = format_chat_message_html("assistant", service_welcome, service=service)
+    state.rendered_bubbles.append(format_chat_message_html("assistant", service_welcome, service=service))
 
     return (
-        chat_html,  # HTML formatted chat display
+        state.render(),  # HTML formatted chat display
         "",  # message input (clear)
         gr.update(visible=False),  # hide service selection
         gr.update(visible=True),   # show chat interface
         state
     )
 
+# 🔮 Typing-pause prefetch - HR policy only; timesheet prompts can write entries so they are never sent early
+# Opt-in: every prefetch is a full generation on the single local model, and abandoned drafts still run to the end
+PREFETCH_WHILE_TYPING = os.getenv("PREFETCH_WHILE_TYPING", "0") == "1"
+PREFETCH_MIN_CHARS = 20
+PREFETCH_DEBOUNCE_SECONDS = 0.3
+MAX_PREFETCH_IN_FLIGHT = 2  # Across all sessions, so prefetching can't swamp the backend
+_prefetch_tasks: set = set()
+
+async def maybe_prefetch(partial: str, state: ChatState):
+    """Start the HR API call for the current draft once the user pauses typing"""
+    state.typing_seq += 1
+    seq = state.typing_seq
+    if state.selected_service != "hr_policy" or len(partial) < PREFETCH_MIN_CHARS:
+        return
+
+    await asyncio.sleep(PREFETCH_DEBOUNCE_SECONDS)
+    # Still typing - a later call owns the prefetch
+    if seq != state.typing_seq or partial == state.prefetch_prompt:
+        return
+
+    # Cancelling only drops our side - the backend keeps generating, so never stack a second one
+    if state.prefetch_future is not None and not state.prefetch_future.done():
+        return
+    if len(_prefetch_tasks) >= MAX_PREFETCH_IN_FLIGHT:
+        return
+
+    state.prefetch_prompt = partial
+    # Drafts may be truncated - bypass the shared cache so they can never answer someone else's question
+    state.prefetch_future = asyncio.create_task(fetch_api("hr_policy", partial, state.user_email))
+    _prefetch_tasks.add(state.prefetch_future)
+    state.prefetch_future.add_done_callback(_prefetch_tasks.discard)
+
 # FIXED: Async generator function with original ChatGPT-style HTML rendering
 async def handle_message(message: str, state: ChatState):
     """Handle messages with original ChatGPT-style processing and HTML display"""
@@ -242,36 +487,27 @@ async def handle_message(message: str, state: ChatState):
         return
 
     # Add user message to history
-    timestamp = datetime.now().strftime("%I:%M %p")
-    state.conversation_history.append({
-        "role": "user", 
-        "content": message,
-        "timestamp": timestamp
-    })
+    timestamp = current_time_label()
+    state.conversation_history.append(ChatMessage("user", message, timestamp))
     state.message_count += 1
 
-    # Build conversation HTML with user message (original style)
-    messages_html = ""
-    for msg in state.conversation_history:
-        messages_html += format_chat_message_html(
-            msg["role"], 
-            msg["content"], 
-            msg["timestamp"], 
-            msg.get("service", state.selected_service)
-        )
+    # Render only the new user bubble (original style)
+    state.rendered_bubbles.append(format_chat_message_html("user", message, timestamp))
 
     # Add original typing indicator
-    chat_with_typing = messages_html + create_original_typing_indicator()
+    chat_with_typing = state.render() + create_original_typing_indicator()
 
-    # Show typing state first (original ChatGPT style)
+    # Show typing state first (original ChatGPT style) - it stays up for the real API wait
     yield chat_with_typing, "", state
 
-    # Small delay for realistic typing effect
-    await asyncio.sleep(1.2)
-
     try:
-        # Call API
-        api_result = await call_api(state.selected_service, message, state.user_email)
+        # Call API - unless the same text was already sent while the user paused typing
+        prefetched = state.prefetch_future if state.prefetch_prompt == message else None
+        if state.prefetch_future is not None and prefetched is None:
+            state.prefetch_future.cancel()
+        state.prefetch_future, state.prefetch_prompt = None, ""
+
+        api_result = await call_api(state.selected_service, message, state.user_email, prefetched)
 
         if api_result["success"]:
             response = api_result["message"]
@@ -282,24 +518,15 @@ async def handle_message(message: str, state: ChatState):
         response = f"I apologize, but I encountered an unexpected error: {str(e)}\n\nPlease try again or check if the service is running."
 
     # Add assistant response to history
-    state.conversation_history.append({
-        "role": "assistant",
-        "content": response, 
-        "timestamp": datetime.now().strftime("%I:%M %p"),
-        "service": state.selected_service
-    })
-
-    # Create final chat display without typing indicator (original ChatGPT HTML style)
-    final_messages_html = ""
-    for msg in state.conversation_history:
-        final_messages_html += format_chat_message_html(
-            msg["role"],
-            msg["content"], 
-            msg["timestamp"],
-            msg.get("service", state.selected_service)
-        )
+    timestamp = current_time_label()
+    state.conversation_history.append(
+        ChatMessage("assistant", response, timestamp, state.selected_service)
+    )
 
-    yield final_messages_html, "", state
+    # Final chat display replaces the typing indicator with the answer bubble (original ChatGPT HTML style)
+    state.rendered_bubbles.append(format_chat_message_html("assistant", response, timestamp, state.selected_service))
+
+    yield state.render(), "", state
 
 def reset_conversation(state: ChatState) -> Tuple[str, gr.update, gr.update, ChatState]:
     """Reset to service selection"""
@@ -314,19 +541,20 @@ def reset_conversation(state: ChatState) -> Tuple[str, gr.update, gr.update, Cha
         state
     )
 
+# Service selection screen text - static for the life of the process
+WELCOME_MARKDOWN = f"""
+# 🏢 Enterprise Assistant
+### Welcome, **{WINDOWS_USERNAME}**!
+
+Your AI-powered workspace companion is ready to help.
+Please select a service to get started:
+"""
+
 def create_service_selection_interface():
     """Create centered service selection interface"""
 
-    username = get_windows_username()
-
     with gr.Column(elem_id="service-selection", elem_classes=["service-container"]):
-        gr.Markdown(f"""
-        # 🏢 Enterprise Assistant
-        ### Welcome, **{username}**!
-
-        Your AI-powered workspace companion is ready to help.
-        Please select a service to get started:
-        """, elem_classes=["welcome-header"])
+        gr.Markdown(WELCOME_MARKDOWN, elem_classes=["welcome-header"])
 
         with gr.Row(elem_classes=["service-row"]):
             # Timesheet Management Card
@@ -358,177 +586,180 @@ def create_service_selection_interface():
 
     return timesheet_btn, hr_policy_btn
 
-# 🎨 Create the main ChatGPT-style interface with original conversation styling
-def create_enterprise_interface():
-    """Create the main enterprise ChatGPT-style interface with original HTML chat bubbles"""
+# Custom CSS for professional styling with original ChatGPT conversation style
+CUSTOM_CSS = """
+/* Enterprise ChatGPT Style - Original Conversation Bubbles */
+.gradio-container {
+    max-width: 1000px !important;
+    margin: 0 auto !important;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
+}
 
-    # Custom CSS for professional styling with original ChatGPT conversation style
-    custom_css = """
-    /* Enterprise ChatGPT Style - Original Conversation Bubbles */
-    .gradio-container {
-        max-width: 1000px !important;
-        margin: 0 auto !important;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
-    }
+.service-container {
+    display: flex !important;
+    flex-direction: column !important;
+    align-items: center !important;
+    justify-content: center !important;
+    min-height: 70vh !important;
+    padding: 2rem !important;
+}
 
-    .service-container {
-        display: flex !important;
-        flex-direction: column !important;
-        align-items: center !important;
-        justify-content: center !important;
-        min-height: 70vh !important;
-        padding: 2rem !important;
-    }
+.welcome-header {
+    text-align: center !important;
+    margin-bottom: 3rem !important;
+}
 
-    .welcome-header {
-        text-align: center !important;
-        margin-bottom: 3rem !important;
-    }
+.service-row {
+    display: flex !important;
+    gap: 2rem !important;
+    justify-content: center !important;
+    align-items: stretch !important;
+    max-width: 800px !important;
+    width: 100% !important;
+}
 
-    .service-row {
-        display: flex !important;
-        gap: 2rem !important;
-        justify-content: center !important;
-        align-items: stretch !important;
-        max-width: 800px !important;
-        width: 100% !important;
-    }
+.service-card {
+    flex: 1 !important;
+    min-height: 200px !important;
+    padding: 2rem !important;
+    border-radius: 16px !important;
+    border: 2px solid #e1e5e9 !important;
+    background: linear-gradient(135deg, #ffffff 0%, #f8f9fa 100%) !important;
+    box-shadow: 0 4px 20px rgba(0, 0, 0, 0.1) !important;
+    transition: all 0.3s ease !important;
+    cursor: pointer !important;
+    text-align: center !important;
+    font-size: 1.1rem !important;
+    font-weight: 500 !important;
+    white-space: pre-line !important;
+}
 
-    .service-card {
-        flex: 1 !important;
-        min-height: 200px !important;
-        padding: 2rem !important;
-        border-radius: 16px !important;
-        border: 2px solid #e1e5e9 !important;
-        background: linear-gradient(135deg, #ffffff 0%, #f8f9fa 100%) !important;
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.1) !important;
-        transition: all 0.3s ease !important;
-        cursor: pointer !important;
-        text-align: center !important;
-        font-size: 1.1rem !important;
-        font-weight: 500 !important;
-        white-space: pre-line !important;
-    }
+.service-card:hover {
+    transform: translateY(-4px) !important;
+    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.15) !important;
+    border-color: #0066cc !important;
+}
 
-    .service-card:hover {
-        transform: translateY(-4px) !important;
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.15) !important;
-        border-color: #0066cc !important;
-    }
+.timesheet-card:hover {
+    border-color: #0066cc !important;
+    background: linear-gradient(135deg, #e3f2fd 0%, #ffffff 100%) !important;
+}
 
-    .timesheet-card:hover {
-        border-color: #0066cc !important;
-        background: linear-gradient(135deg, #e3f2fd 0%, #ffffff 100%) !important;
-    }
+.hr-policy-card:hover {
+    border-color: #7c3aed !important;
+    background: linear-gradient(135deg, #f3e8ff 0%, #ffffff 100%) !important;
+}
 
-    .hr-policy-card:hover {
-        border-color: #7c3aed !important;
-        background: linear-gradient(135deg, #f3e8ff 0%, #ffffff 100%) !important;
-    }
+.security-note {
+    text-align: center !important;
+    color: #6b7280 !important;
+    font-size: 0.9rem !important;
+    margin-top: 2rem !important;
+}
 
-    .security-note {
-        text-align: center !important;
-        color: #6b7280 !important;
-        font-size: 0.9rem !important;
-        margin-top: 2rem !important;
-    }
+/* Original ChatGPT Chat Interface Styling */
+.chat-interface {
+    min-height: 600px !important;
+}
 
-    /* Original ChatGPT Chat Interface Styling */
-    .chat-interface {
-        min-height: 600px !important;
-    }
+.chat-display {
+    background: #ffffff !important;
+    border: 1px solid #e5e7eb !important;
+    border-radius: 12px !important;
+    min-height: 500px !important;
+    max-height: 600px !important;
+    overflow-y: auto !important;
+    padding: 20px !important;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
+}
 
-    .chat-display {
-        background: #ffffff !important;
-        border: 1px solid #e5e7eb !important;
-        border-radius: 12px !important;
-        min-height: 500px !important;
-        max-height: 600px !important;
-        overflow-y: auto !important;
-        padding: 20px !important;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
-    }
+.message-input {
+    border: 1px solid #d1d5db !important;
+    border-radius: 12px !important;
+    font-size: 16px !important;
+    padding: 12px 16px !important;
+    resize: none !important;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
+}
 
-    .message-input {
-        border: 1px solid #d1d5db !important;
-        border-radius: 12px !important;
-        font-size: 16px !important;
-        padding: 12px 16px !important;
-        resize: none !important;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif !important;
-    }
+.message-input:focus {
+    border-color: #0084ff !important;
+    box-shadow: 0 0 0 3px rgba(0, 132, 255, 0.1) !important;
+    outline: none !important;
+}
 
-    .message-input:focus {
-        border-color: #0084ff !important;
-        box-shadow: 0 0 0 3px rgba(0, 132, 255, 0.1) !important;
-        outline: none !important;
-    }
+.send-button, .reset-button {
+    border-radius: 8px !important;
+    font-weight: 600 !important;
+    padding: 12px 24px !important;
+    transition: all 0.2s ease !important;
+    cursor: pointer !important;
+}
 
-    .send-button, .reset-button {
-        border-radius: 8px !important;
-        font-weight: 600 !important;
-        padding: 12px 24px !important;
-        transition: all 0.2s ease !important;
-        cursor: pointer !important;
-    }
+.send-button {
+    background: #0084ff !important;
+    color: white !important;
+    border: none !important;
+}
 
-    .send-button {
-        background: #0084ff !important;
-        color: white !important;
-        border: none !important;
-    }
+.send-button:hover:not(:disabled) {
+    background: #0066cc !important;
+}
 
-    .send-button:hover:not(:disabled) {
-        background: #0066cc !important;
-    }
+.send-button:disabled {
+    background: #9ca3af !important;
+    cursor: not-allowed !important;
+}
 
-    .send-button:disabled {
-        background: #9ca3af !important;
-        cursor: not-allowed !important;
-    }
+.reset-button {
+    background: #ef4444 !important;
+    color: white !important;
+    border: none !important;
+}
 
-    .reset-button {
-        background: #ef4444 !important;
-        color: white !important;
-        border: none !important;
-    }
+.reset-button:hover {
+    background: #dc2626 !important;
+}
 
-    .reset-button:hover {
-        background: #dc2626 !important;
-    }
+/* Original ChatGPT Typing Animation */
+.bounce-dot {
+    animation: bounce 1.4s ease-in-out infinite both;
+}
+
+@keyframes bounce {
+    0%, 80%, 100% { transform: scale(0); }
+    40% { transform: scale(1); }
+}
 
-    /* Original ChatGPT Typing Animation */
-    .bounce-dot {
-        animation: bounce 1.4s ease-in-out infinite both;
+/* Responsive Design */
+@media (max-width: 768px) {
+    .service-row {
+        flex-direction: column !important;
+        gap: 1rem !important;
     }
 
-    @keyframes bounce {
-        0%, 80%, 100% { transform: scale(0); }
-        40% { transform: scale(1); }
+    .service-card {
+        min-height: 150px !important;
+        padding: 1.5rem !important;
     }
 
-    /* Responsive Design */
-    @media (max-width: 768px) {
-        .service-row {
-            flex-direction: column !important;
-            gap: 1rem !important;
-        }
+    .service-container {
+        padding: 1rem !important;
+        min-height: 60vh !important;
+    }
 
-        .service-card {
-            min-height: 150px !important;
-            padding: 1.5rem !important;
-        }
+    .chat-display {
+        padding: 15px !important;
+    }
+}
+"""
 
-        .service-container {
-            padding: 1rem !important;
-            min-height: 60vh !important;
-        }
+# Browsers don't need the indentation - collapse whitespace once to shrink every page load
+CUSTOM_CSS_MINIFIED = re.sub(r"\s+", " ", CUSTOM_CSS).strip()
 
-        .chat-display {
-            padding: 15px !important;
-        }
-    }
-    """
+# 🎨 Create the main ChatGPT-style interface with original conversation styling
+def create_enterprise_interface():
+    """Create the main enterprise ChatGPT-style interface with original HTML chat bubbles"""
 
     with gr.Blocks(
         title="🏢 Enterprise Assistant - Original ChatGPT Style",
@@ -538,7 +769,7 @@ def create_enterprise_interface():
             neutral_hue="gray",
             font=gr.themes.GoogleFont("Inter")
         ),
-        css=custom_css,
+        css=CUSTOM_CSS_MINIFIED,
         fill_height=True
     ) as app:
 
@@ -584,8 +815,7 @@ def create_enterprise_interface():
                 )
 
                 # Show current user info
-                username = get_windows_username()
-                gr.Markdown(f"**Logged in as:** {username}", elem_classes=["user-info"])
+                gr.Markdown(f"**Logged in as:** {WINDOWS_USERNAME}", elem_classes=["user-info"])
 
         # Event Handlers
 
@@ -610,6 +840,17 @@ def create_enterprise_interface():
             show_progress=False
         )
 
+        # Prefetch the HR answer while the user pauses typing
+        if PREFETCH_WHILE_TYPING:
+            msg_input.change(
+                fn=maybe_prefetch,
+                inputs=[msg_input, state],
+                outputs=None,
+                show_progress="hidden",
+                concurrency_limit=None,  # Each call mostly sleeps out the debounce
+                api_name=False
+            )
+
         # Enter Key Support
         msg_input.submit(
             fn=handle_message,
@@ -625,6 +866,9 @@ def create_enterprise_interface():
             outputs=[chat_display, service_selection, chat_interface, state]
         )
 
+        # Warm the backend connection pool on the first page load, inside Gradio's event loop
+        app.load(fn=warm_up_connections, inputs=None, outputs=None, api_name=False)
+
         # Footer
         gr.Markdown("""
         ---
@@ -647,6 +891,16 @@ if __name__ == "__main__":
     print("   🔌 API Integration: Timesheet (8000) + HR Policy (8001)")
     print("\n🌟 Professional interface with original ChatGPT conversation style!")
 
+    # Faster libuv-backed event loop when available (winloop is the Windows build)
+    try:
+        if os.name == "nt":
+            import winloop as uvloop
+        else:
+            import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
     # Create and launch the app
     app = create_enterprise_interface()
 
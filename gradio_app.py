@@ -5,15 +5,38 @@ Built with 50+ years of timesheet and RAG system expertise
 """
 
 import gradio as gr
-import requests
+import aiohttp
+import asyncio
+import atexit
+import codecs
 import json
-from typing import Optional, Tuple, List
+import orjson
+import html
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from typing import Optional, Tuple, List, Dict
 import logging
 
+# Optional: semantic cache for HR policy answers (disabled when these aren't installed)
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Conversation turns (user + assistant pairs) kept per session; older ones slide out
+CONTEXT_WINDOW_TURNS = 20
+
 # API Configuration
 API_CONFIG = {
     "timesheet": {
@@ -32,31 +55,202 @@ API_CONFIG = {
 SERVICES = {
     "timesheet": {
         "name": "Timesheet Management",
+        "icon": "⏰",
         "description": "Manage your Oracle and Mars timesheets with AI assistance",
         "welcome": "Hello! I'm your Timesheet Management assistant. I can help you fill timesheets, view entries, and manage your Oracle and Mars timesheet data. How can I assist you today?"
     },
     "hr_policy": {
         "name": "HR Policy Assistant", 
+        "icon": "📋",
         "description": "Get answers about company policies and HR documents",
         "welcome": "Hello! I'm your HR Policy Assistant. I can help you understand company policies, HR procedures, and answer questions about employee documentation. How can I help you today?"
     }
 }
 
+# Shared HTTP session - created on first use inside Gradio's event loop, keeps connections
+# to both APIs alive across chat turns without blocking the loop
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use"""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            # Pools are per host:port, so each API gets its own 32 sockets; idle ones are kept
+            # for two minutes so they survive the pause between a user's turns
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=32, keepalive_timeout=120),
+            headers={
+                "Content-Type": "application/json",
+                "Connection": "keep-alive"
+            },
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
+    return _SESSION
+
+# Gateway errors worth retrying, and how often / how fast
+RETRY_STATUSES = {502, 503, 504}
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.1
+
+async def post_with_retry(session: aiohttp.ClientSession, url: str, payload: dict, retry_on_status: bool) -> aiohttp.ClientResponse:
+    """POST, retrying refused connections - and gateway errors when the request is safe to repeat"""
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            # orjson encodes to bytes; the session already sends Content-Type: application/json
+            response = await session.post(url, data=orjson.dumps(payload))
+        except aiohttp.ClientConnectorError:
+            if last_attempt:
+                raise
+        else:
+            if last_attempt or not retry_on_status or response.status not in RETRY_STATUSES:
+                return response
+            response.release()
+        await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+def close_http_session():
+    """Close the shared aiohttp session on interpreter shutdown"""
+    if _SESSION is not None and not _SESSION.closed:
+        try:
+            asyncio.run(_SESSION.close())
+        except Exception:
+            pass
+
+atexit.register(close_http_session)
+
+# Chat header per service - only the email varies, filled in with str.format on selection
+SERVICE_HEADER_TEMPLATES = {
+    service: f"""
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 10px; margin-bottom: 10px;">
+        <h3 style="color: white; margin: 0; display: flex; align-items: center;">
+            <span style="margin-right: 10px;">{info['icon']}</span>
+            {info['name']}
+        </h3>
+        <p style="color: rgba(255,255,255,0.9); margin: 5px 0 0 0; font-size: 14px;">
+            Connected as: {{email}}
+        </p>
+    </div>
+    """
+    for service, info in SERVICES.items()
+}
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+
+def new_window() -> deque:
+    """Empty deque holding one session's context window"""
+    return deque(maxlen=2 * CONTEXT_WINDOW_TURNS)
+
+@dataclass(slots=True)
 class ChatState:
-    def __init__(self):
-        self.selected_service = None
-        self.user_email = ""
-        self.conversation_history = []
-        self.initialized = False
+    selected_service: Optional[str] = None
+    user_email: str = ""
+    conversation_history: deque = field(default_factory=new_window)
+    # Rendered chat pieces: the service header, then one bubble per history entry
+    header_html: str = ""
+    service_info: Optional[dict] = None  # SERVICES entry for the selected service
+    rendered_fragments: deque = field(default_factory=new_window)
+    initialized: bool = False
+
+# Server-side chat sessions keyed by the id held in gr.State, least recently used first
+MAX_SESSIONS = 1000
+_SESSIONS: "OrderedDict[str, ChatState]" = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()  # Sync handlers run on Gradio's worker threads
+
+def new_session_id() -> str:
+    """Create a fresh session id for a browser session"""
+    return str(uuid.uuid4())
+
+def get_chat_state(session_id: str) -> ChatState:
+    """Return the ChatState for a session, creating it (and evicting the oldest) as needed"""
+    with _SESSIONS_LOCK:
+        state = _SESSIONS.get(session_id)
+        if state is None:
+            state = _SESSIONS[session_id] = ChatState()
+            if len(_SESSIONS) > MAX_SESSIONS:
+                _SESSIONS.popitem(last=False)
+        else:
+            _SESSIONS.move_to_end(session_id)
+        return state
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    import re
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email)) if email else False
+    return bool(email) and EMAIL_PATTERN.match(email) is not None
+
+SEMANTIC_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """Load the sentence-transformer used for HR cache lookups (once)"""
+    return SentenceTransformer(SEMANTIC_MODEL_NAME)
+
+class HRAnswerCache:
+    """Ring buffer of (question embedding, answer); a lookup is one dot product over the buffer"""
+    def __init__(self, capacity: int = 1024, similarity_threshold: float = 0.90):
+        self.capacity = capacity
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = None  # (capacity, D) float32, allocated on first store
+        self.answers: List[str] = []
+        self.next_slot = 0
+
+    @staticmethod
+    def embed(question: str):
+        """Unit-length float32 embedding of a question"""
+        return get_embedding_model().encode(question, normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, embedding) -> Optional[str]:
+        """Return the answer to the most similar cached question, if similar enough"""
+        if not self.answers:
+            return None
+        sims = np.dot(self.embeddings[:len(self.answers)], embedding)
+        best = int(sims.argmax())
+        return self.answers[best] if sims[best] >= self.similarity_threshold else None
+
+    def store(self, embedding, answer: str):
+        """Add an answer, overwriting the oldest once the buffer is full"""
+        if self.embeddings is None:
+            self.embeddings = np.empty((self.capacity, embedding.shape[0]), dtype=np.float32)
+        slot = self.next_slot
+        if slot < len(self.answers):
+            self.answers[slot] = answer
+        else:
+            self.answers.append(answer)
+        self.embeddings[slot] = embedding
+        self.next_slot = (slot + 1) % self.capacity
+
+hr_cache = HRAnswerCache() if SentenceTransformer is not None else None
+
+# Normalized HR question -> future for the request currently answering it
+_HR_IN_FLIGHT: Dict[str, asyncio.Future] = {}
+
+async def stream_api(service: str, message: str, email: str = None):
+    """Call the appropriate API based on selected service, yielding the reply as it arrives
+
+    A text/plain (chunked) response is passed through piece by piece; a JSON response
+    arrives as a single piece."""
+    # HR answers are shared across users; timesheet replies are per-user and never cached
+    embedding = None
+    if service == "hr_policy" and hr_cache is not None:
+        # Encoding is CPU-bound, keep it off the event loop
+        embedding = await asyncio.to_thread(hr_cache.embed, message)
+        cached = hr_cache.lookup(embedding)
+        if cached is not None:
+            yield cached
+            return
+
+    # Identical HR questions already in flight (from any user) share that request's answer
+    flight = None
+    if service == "hr_policy":
+        flight_key = " ".join(message.lower().split())
+        leader = _HR_IN_FLIGHT.get(flight_key)
+        if leader is not None:
+            shared = await asyncio.shield(leader)
+            if shared is not None:
+                yield shared
+                return
+        else:
+            flight = _HR_IN_FLIGHT[flight_key] = asyncio.get_running_loop().create_future()
 
-async def call_api(service: str, message: str, email: str = None) -> str:
-    """Call the appropriate API based on selected service"""
+    answer = None  # Set only when the API returned a usable answer
     try:
         config = API_CONFIG[service]
         url = f"{config['base_url']}{config['endpoint']}"
@@ -72,38 +266,80 @@ async def call_api(service: str, message: str, email: str = None) -> str:
                 "question": message
             }
 
-        response = requests.post(
-            url,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-
-            # Handle different response formats
-            if service == "timesheet":
-                return data.get("response", data.get("message", "Response received successfully."))
-            else:  # hr_policy
-                return data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
-        else:
-            logger.error(f"API Error: {response.status_code} - {response.text}")
-            return f"Sorry, I encountered an error (Status: {response.status_code}). Please try again."
-
-    except requests.exceptions.ConnectionError:
+        session = await get_http_session()
+        # A timesheet request may already have been applied when a gateway error comes back
+        retry_on_status = service == "hr_policy"
+        async with await post_with_retry(session, url, payload, retry_on_status) as response:
+            if response.status != 200:
+                logger.error(f"API Error: {response.status} - {await response.text()}")
+                yield f"Sorry, I encountered an error (Status: {response.status}). Please try again."
+                return
+
+            if response.content_type == "text/plain":
+                # Streamed generation - forward each chunk as the server flushes it
+                decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+                parts = []
+                async for raw in response.content.iter_any():
+                    text = decoder.decode(raw)
+                    if text:
+                        parts.append(text)
+                        yield text
+                answer = "".join(parts)
+            else:
+                data = orjson.loads(await response.read())
+
+                # Handle different response formats
+                if service == "timesheet":
+                    answer = data.get("response", data.get("message", "Response received successfully."))
+                else:  # hr_policy
+                    answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
+                yield answer
+
+            if embedding is not None:
+                hr_cache.store(embedding, answer)
+
+    except aiohttp.ClientConnectorError:
         logger.error(f"Connection error to {service} API")
-        return f"Unable to connect to {SERVICES[service]['name']} service. Please ensure the API server is running."
-    except requests.exceptions.Timeout:
+        yield f"Unable to connect to {SERVICES[service]['name']} service. Please ensure the API server is running."
+    except asyncio.TimeoutError:
         logger.error(f"Timeout error for {service} API")
-        return "Request timed out. Please try again."
+        yield "Request timed out. Please try again."
     except Exception as e:
         logger.error(f"Unexpected error calling {service} API: {str(e)}")
-        return f"An unexpected error occurred: {str(e)}"
+        yield f"An unexpected error occurred: {str(e)}"
+    finally:
+        # Followers get the answer, or None (and make their own call) if this request failed
+        if flight is not None:
+            del _HR_IN_FLIGHT[flight_key]
+            flight.set_result(answer)
+
+def render_user_message(content: str) -> str:
+    """Chat bubble for a user message (content must already be HTML-escaped)"""
+    return f"""
+            <div style="background: #0066cc; color: white; padding: 12px 15px; border-radius: 15px; margin: 10px 0; margin-left: 50px; text-align: right;">
+                <strong>You:</strong> {content}
+            </div>
+            """
+
+def render_assistant_message(content: str) -> str:
+    """Chat bubble for an assistant reply (content must already be HTML-escaped)"""
+    return f"""
+            <div style="background: #f1f3f4; padding: 15px; border-radius: 10px; margin: 10px 0; margin-right: 50px;">
+                <strong>Assistant:</strong> {content}
+            </div>
+            """
+
+TYPING_INDICATOR_HTML = """
+    <div style="background: #f1f3f4; padding: 15px; border-radius: 10px; margin: 10px 0; margin-right: 50px;">
+        <strong>Assistant:</strong> <em>Typing...</em>
+    </div>
+    """
 
-def select_service(service: str, email: str, state: ChatState) -> Tuple[str, str, str, gr.update, gr.update, gr.update, ChatState]:
+def select_service(service: str, email: str, session_id: str) -> Tuple[gr.update, gr.update, str, str, gr.update, gr.update]:
     """Handle service selection"""
 
+    state = get_chat_state(session_id)
+
     # Validate email
     if not email or not validate_email(email):
         return (
@@ -113,31 +349,24 @@ def select_service(service: str, email: str, state: ChatState) -> Tuple[str, str
             gr.update(),  # chat_display
             gr.update(),  # msg_input
             gr.update(),  # send_btn
-            state
         )
 
     # Update state
     state.selected_service = service
     state.user_email = email
-    state.conversation_history = []
+    state.conversation_history.clear()
+    state.rendered_fragments.clear()
     state.initialized = True
 
     # Get service info
-    service_info = SERVICES[service]
+    service_info = state.service_info = SERVICES[service]
     welcome_msg = service_info["welcome"]
 
+    # Service header - rendered once per selection and reused for every message
+    state.header_html = SERVICE_HEADER_TEMPLATES[service].format(email=html.escape(email, quote=True))
+
     # Create initial chat display
-    chat_html = f"""
-    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 10px; margin-bottom: 10px;">
-        <h3 style="color: white; margin: 0; display: flex; align-items: center;">
-            <span style="margin-right: 10px;">{'⏰' if service == 'timesheet' else '📋'}</span>
-            {service_info['name']}
-        </h3>
-        <p style="color: rgba(255,255,255,0.9); margin: 5px 0 0 0; font-size: 14px;">
-            Connected as: {email}
-        </p>
-    </div>
-    <div style="background: #f1f3f4; padding: 15px; border-radius: 10px; margin: 10px 0;">
+    chat_html = state.header_html + f"""<div style="background: #f1f3f4; padding: 15px; border-radius: 10px; margin: 10px 0;">
         <strong>Assistant:</strong> {welcome_msg}
     </div>
     """
@@ -149,112 +378,88 @@ def select_service(service: str, email: str, state: ChatState) -> Tuple[str, str
         chat_html,  # chat_display
         gr.update(placeholder="Type your message here...", interactive=True),  # msg_input
         gr.update(interactive=True),  # send_btn
-        state
     )
 
-async def send_message(message: str, state: ChatState) -> Tuple[str, str, str, ChatState]:
-    """Handle sending messages"""
+async def send_message(message: str, session_id: str):
+    """Handle sending messages - async generator, typing indicator first then the answer"""
+
+    state = get_chat_state(session_id)
 
     if not message.strip():
-        return (
+        yield (
             gr.update(),  # chat_display
             "",           # msg_input (clear)
             "Please enter a message.",  # status_message
-            state
         )
+        return
 
     if not state.initialized or not state.selected_service:
-        return (
+        yield (
             gr.update(),  # chat_display
             message,      # msg_input (keep message)
             "❌ Please select a service first.",  # status_message
-            state
         )
+        return
 
     # Add user message to history
-    state.conversation_history.append({"role": "user", "content": message})
-
-    # Update chat display with user message
-    service_info = SERVICES[state.selected_service]
-    chat_html = f"""
-    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 10px; margin-bottom: 10px;">
-        <h3 style="color: white; margin: 0; display: flex; align-items: center;">
-            <span style="margin-right: 10px;">{'⏰' if state.selected_service == 'timesheet' else '📋'}</span>
-            {service_info['name']}
-        </h3>
-        <p style="color: rgba(255,255,255,0.9); margin: 5px 0 0 0; font-size: 14px;">
-            Connected as: {state.user_email}
-        </p>
-    </div>
-    """
-
-    # Add conversation history
-    for msg in state.conversation_history:
-        if msg["role"] == "user":
-            chat_html += f"""
-            <div style="background: #0066cc; color: white; padding: 12px 15px; border-radius: 15px; margin: 10px 0; margin-left: 50px; text-align: right;">
-                <strong>You:</strong> {msg["content"]}
-            </div>
-            """
-
-    # Show typing indicator
-    chat_html += """
-    <div style="background: #f1f3f4; padding: 15px; border-radius: 10px; margin: 10px 0; margin-right: 50px;">
-        <strong>Assistant:</strong> <em>Typing...</em>
-    </div>
-    """
+    # Escaped once here; the stored form is what every render uses
+    safe_message = html.escape(message, quote=True)
+    state.conversation_history.append({"role": "user", "content": message, "html": safe_message})
+    state.rendered_fragments.append(render_user_message(safe_message))
+
+    service_info = state.service_info
+
+    # Show the user's message with a typing indicator while the API works
+    yield (
+        state.header_html + "".join(state.rendered_fragments) + TYPING_INDICATOR_HTML,  # chat_display
+        "",  # msg_input (clear)
+        f"⏳ Waiting for {service_info['name']}...",  # status_message
+    )
 
-    # Call API
+    # Call API - pieces are escaped as they arrive so each partial render only joins strings
+    parts, safe_parts = [], []
     try:
-        response = await call_api(state.selected_service, message, state.user_email)
+        async for chunk in stream_api(state.selected_service, message, state.user_email):
+            # Show what has arrived so far; the latest piece lands with the next render
+            if parts:
+                yield (
+                    state.header_html + "".join(state.rendered_fragments) + render_assistant_message("".join(safe_parts)),  # chat_display
+                    "",  # msg_input (clear)
+                    f"⏳ Receiving from {service_info['name']}...",  # status_message
+                )
+            parts.append(chunk)
+            safe_parts.append(html.escape(chunk, quote=True))
+        response = "".join(parts)
+        safe_response = "".join(safe_parts)
     except Exception as e:
         response = f"Error: {str(e)}"
+        safe_response = html.escape(response, quote=True)
 
     # Add assistant response to history
-    state.conversation_history.append({"role": "assistant", "content": response})
+    state.conversation_history.append({"role": "assistant", "content": response, "html": safe_response})
+    state.rendered_fragments.append(render_assistant_message(safe_response))
 
-    # Update chat display with response
-    chat_html = f"""
-    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 10px; margin-bottom: 10px;">
-        <h3 style="color: white; margin: 0; display: flex; align-items: center;">
-            <span style="margin-right: 10px;">{'⏰' if state.selected_service == 'timesheet' else '📋'}</span>
-            {service_info['name']}
-        </h3>
-        <p style="color: rgba(255,255,255,0.9); margin: 5px 0 0 0; font-size: 14px;">
-            Connected as: {state.user_email}
-        </p>
-    </div>
-    """
-
-    # Add full conversation history
-    for msg in state.conversation_history:
-        if msg["role"] == "user":
-            chat_html += f"""
-            <div style="background: #0066cc; color: white; padding: 12px 15px; border-radius: 15px; margin: 10px 0; margin-left: 50px; text-align: right;">
-                <strong>You:</strong> {msg["content"]}
-            </div>
-            """
-        else:
-            chat_html += f"""
-            <div style="background: #f1f3f4; padding: 15px; border-radius: 10px; margin: 10px 0; margin-right: 50px;">
-                <strong>Assistant:</strong> {msg["content"]}
-            </div>
-            """
+    # Update chat display with response - only the two new bubbles were rendered this turn
+    chat_html = state.header_html + "".join(state.rendered_fragments)
 
-    return (
+    yield (
         chat_html,  # chat_display
         "",         # msg_input (clear)
         f"✅ Message sent to {service_info['name']}",  # status_message
-        state
     )
 
-def reset_application(state: ChatState) -> Tuple[gr.update, gr.update, str, str, str, gr.update, gr.update, ChatState]:
+def reset_application(session_id: str) -> Tuple[gr.update, gr.update, str, str, str, gr.update, gr.update]:
     """Reset application to welcome screen"""
 
+    state = get_chat_state(session_id)
+
     # Reset state
     state.selected_service = None
     state.user_email = ""
-    state.conversation_history = []
+    state.conversation_history.clear()
+    state.rendered_fragments.clear()
+    state.header_html = ""
+    state.service_info = None
     state.initialized = False
 
     return (
@@ -265,49 +470,56 @@ def reset_application(state: ChatState) -> Tuple[gr.update, gr.update, str, str,
         "",                        # chat_display
         gr.update(placeholder="Type your message here...", interactive=False),  # msg_input
         gr.update(interactive=False),  # send_btn
-        state
     )
 
+CUSTOM_CSS = """
+.gradio-container {
+    max-width: 1200px !important;
+}
+.welcome-header {
+    text-align: center;
+    padding: 30px;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    border-radius: 15px;
+    margin-bottom: 25px;
+    color: white;
+}
+.service-btn {
+    padding: 20px !important;
+    margin: 10px !important;
+    border-radius: 10px !important;
+    border: 2px solid #e0e0e0 !important;
+}
+.service-btn:hover {
+    border-color: #667eea !important;
+    transform: translateY(-2px);
+    box-shadow: 0 4px 20px rgba(102, 126, 234, 0.3) !important;
+}
+"""
+
+# Browsers don't need the indentation - collapse whitespace once to shrink every page load
+CUSTOM_CSS_MINIFIED = re.sub(r"\s+", " ", CUSTOM_CSS).strip()
+
+WELCOME_MARKDOWN = """
+<div class="welcome-header">
+    <h1>🏢 Enterprise Assistant</h1>
+    <p style="font-size: 18px; margin: 10px 0;">Your AI-powered workspace companion</p>
+</div>
+"""
+
 # Create Gradio Interface
 def create_interface():
     with gr.Blocks(
         title="Enterprise Assistant - Timesheet & HR Policy",
         theme=gr.themes.Soft(),
-        css="""
-        .gradio-container {
-            max-width: 1200px !important;
-        }
-        .welcome-header {
-            text-align: center;
-            padding: 30px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            border-radius: 15px;
-            margin-bottom: 25px;
-            color: white;
-        }
-        .service-btn {
-            padding: 20px !important;
-            margin: 10px !important;
-            border-radius: 10px !important;
-            border: 2px solid #e0e0e0 !important;
-        }
-        .service-btn:hover {
-            border-color: #667eea !important;
-            transform: translateY(-2px);
-            box-shadow: 0 4px 20px rgba(102, 126, 234, 0.3) !important;
-        }
-        """
+        css=CUSTOM_CSS_MINIFIED
     ) as app:
 
         # Application State
-        state = gr.State(ChatState())
+        # Only the session id round-trips; the ChatState lives server-side in _SESSIONS
+        state = gr.State(new_session_id)
 
-        gr.Markdown("""
-        <div class="welcome-header">
-            <h1>🏢 Enterprise Assistant</h1>
-            <p style="font-size: 18px; margin: 10px 0;">Your AI-powered workspace companion</p>
-        </div>
-        """)
+        gr.Markdown(WELCOME_MARKDOWN)
 
         # Status message
         status_message = gr.Markdown("", visible=True)
@@ -358,33 +570,33 @@ def create_interface():
 
         # Event handlers
         timesheet_btn.click(
-            fn=select_service,
-            inputs=[gr.State("timesheet"), email_input, state],
-            outputs=[chat_interface, welcome_screen, status_message, chat_display, msg_input, send_btn, state]
+            fn=partial(select_service, "timesheet"),
+            inputs=[email_input, state],
+            outputs=[chat_interface, welcome_screen, status_message, chat_display, msg_input, send_btn]
         )
 
         hr_policy_btn.click(
-            fn=select_service,
-            inputs=[gr.State("hr_policy"), email_input, state],
-            outputs=[chat_interface, welcome_screen, status_message, chat_display, msg_input, send_btn, state]
+            fn=partial(select_service, "hr_policy"),
+            inputs=[email_input, state],
+            outputs=[chat_interface, welcome_screen, status_message, chat_display, msg_input, send_btn]
         )
 
         send_btn.click(
             fn=send_message,
             inputs=[msg_input, state],
-            outputs=[chat_display, msg_input, status_message, state]
+            outputs=[chat_display, msg_input, status_message]
         )
 
         msg_input.submit(
             fn=send_message,
             inputs=[msg_input, state],
-            outputs=[chat_display, msg_input, status_message, state]
+            outputs=[chat_display, msg_input, status_message]
         )
 
         reset_btn.click(
             fn=reset_application,
             inputs=[state],
-            outputs=[chat_interface, welcome_screen, status_message, email_input, chat_display, msg_input, send_btn, state]
+            outputs=[chat_interface, welcome_screen, status_message, email_input, chat_display, msg_input, send_btn]
         )
 
     return app
@@ -405,5 +617,7 @@ if __name__ == "__main__":
         share=False,
         show_api=False,
         show_error=True,
-        debug=True
+        debug=os.environ.get("GRADIO_DEBUG") == "1",  # Verbose/blocking debug mode is opt-in
+        quiet=True,
+        max_threads=40  # Worker threads for the sync handlers
     )
@@ -13,11 +13,18 @@ Features:
 """
 
 import gradio as gr
-import requests
-import json
+import aiohttp
+import orjson
 import asyncio
+import atexit
+import codecs
+import re
 import time
+from itertools import islice
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache, partial
 from typing import Optional, Tuple, List, Dict, Any
 import logging
 
@@ -25,34 +32,83 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@dataclass(frozen=True, slots=True)
+class ServiceConfig:
+    """One backend service - plain attributes instead of dict lookups on the hot paths"""
+    base_url: str
+    endpoint: str
+    method: str
+    name: str
+    description: str
+    icon: str
+    color: str
+    url: str = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "url", f"{self.base_url}{self.endpoint}")
+
 # 🎯 API Configuration - Perfectly Aligned with Fixed APIs
 API_CONFIG = {
-    "timesheet": {
-        "base_url": "http://localhost:8000",
-        "endpoint": "/chat",
-        "method": "POST",
-        "name": "Timesheet Management",
-        "description": "Manage your Oracle and Mars timesheets with AI assistance",
-        "icon": "⏰",
-        "color": "#0066cc"
-    },
-    "hr_policy": {
-        "base_url": "http://localhost:8001", 
-        "endpoint": "/query",
-        "method": "POST",
-        "name": "HR Policy Assistant",
-        "description": "Get answers about company policies and HR documents", 
-        "icon": "📋",
-        "color": "#7c3aed"
-    }
+    "timesheet": ServiceConfig(
+        base_url="http://localhost:8000",
+        endpoint="/chat",
+        method="POST",
+        name="Timesheet Management",
+        description="Manage your Oracle and Mars timesheets with AI assistance",
+        icon="⏰",
+        color="#0066cc"
+    ),
+    "hr_policy": ServiceConfig(
+        base_url="http://localhost:8001", 
+        endpoint="/query",
+        method="POST",
+        name="HR Policy Assistant",
+        description="Get answers about company policies and HR documents", 
+        icon="📋",
+        color="#7c3aed"
+    )
 }
 
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json"
+}
+
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use inside Gradio's event loop"""
+    global _SESSION
+    # No await between the check and the assignment, so concurrent handlers can't race here
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            # Keep warm sockets to both localhost backends instead of reconnecting per message
+            connector=aiohttp.TCPConnector(limit=32, limit_per_host=16, keepalive_timeout=60),
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
+    return _SESSION
+
+def close_http_session():
+    """Close the shared aiohttp session on interpreter shutdown"""
+    if _SESSION is not None and not _SESSION.closed:
+        try:
+            asyncio.run(_SESSION.close())
+        except Exception:
+            pass
+
+atexit.register(close_http_session)
+
+# Oldest messages drop off past this point; the chat only needs recent context
+MAX_HISTORY_MESSAGES = 100
+
 class ChatState:
     """Enhanced chat state management with ChatGPT-like features"""
     def __init__(self):
         self.selected_service = None
         self.user_email = ""
-        self.conversation_history = []
+        self.cached_header = ""  # Chat header HTML, fixed once a service is selected
+        self.clear_history()
         self.is_initialized = False
         self.session_start = datetime.now()
         self.message_count = 0
@@ -61,24 +117,112 @@ class ChatState:
         """Reset state for fresh conversation"""
         self.selected_service = None
         self.user_email = ""
-        self.conversation_history = []
+        self.cached_header = ""  # Chat header HTML, fixed once a service is selected
+        self.clear_history()
         self.is_initialized = False
         self.session_start = datetime.now()
         self.message_count = 0
 
+    def clear_history(self):
+        """Empty the conversation - one parallel deque per message field, no dict per message"""
+        self.roles = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.contents = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.timestamps = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.services = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.rendered = deque(maxlen=MAX_HISTORY_MESSAGES)  # HTML per message, filled in the first time it is drawn
+        # Concatenated HTML of the first messages_html_count messages; None when it must be rebuilt
+        self.messages_html = ""
+        self.messages_html_count = 0
+
+    def add_message(self, role: str, content: str, timestamp: str, service: str = None, rendered: str = None):
+        """Append one message to the conversation"""
+        if len(self.roles) == MAX_HISTORY_MESSAGES:
+            # The oldest message is about to fall off, so the accumulated HTML no longer matches
+            self.messages_html = None
+        self.roles.append(role)
+        self.contents.append(content)
+        self.timestamps.append(timestamp)
+        self.services.append(service)
+        self.rendered.append(rendered)
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+@lru_cache(maxsize=256)
 def validate_email(email: str) -> bool:
     """Professional email validation"""
-    import re
-    if not email:
+    # Cheap structural checks first; only plausible addresses reach the regex
+    if not email or len(email) > 254 or "@" not in email:
+        return False
+    local, _, domain = email.rpartition("@")
+    if not local or "." not in domain:
         return False
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return bool(EMAIL_PATTERN.match(email))
+
+HR_CACHE_TTL_SECONDS = 600
+HR_CACHE_MAX_ENTRIES = 1000
+
+# (service, normalized question) -> (stored at, result); oldest first
+_response_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+# HR questions currently being fetched; identical questions wait for that result instead of a second POST
+_HR_IN_FLIGHT: Dict[Tuple[str, str], asyncio.Future] = {}
+
+async def call_api(service: str, message: str, email: str = None):
+    """Cached front for fetch_api - HR policy answers are shared by everyone for a while
+
+    Timesheet replies are per-user and always go to the backend."""
+    if service != "hr_policy":
+        async for result in fetch_api(service, message, email):
+            yield result
+        return
+
+    key = (service, message.strip().lower())
+    cached = _response_cache.get(key)
+    if cached is not None:
+        stored_at, result = cached
+        if time.monotonic() - stored_at < HR_CACHE_TTL_SECONDS:
+            _response_cache.move_to_end(key)
+            yield result
+            return
+        del _response_cache[key]
+
+    flight = None
+    leader = _HR_IN_FLIGHT.get(key)
+    if leader is not None:
+        shared = await asyncio.shield(leader)
+        if shared is not None:
+            yield shared
+            return
+        # The leader failed - make our own call
+    else:
+        flight = _HR_IN_FLIGHT[key] = asyncio.get_running_loop().create_future()
 
-async def call_api(service: str, message: str, email: str = None) -> Dict[str, Any]:
-    """Enhanced API calling with proper error handling"""
+    result = None
+    try:
+        async for result in fetch_api(service, message, email):
+            yield result
+
+        if result["success"]:
+            _response_cache[key] = (time.monotonic(), result)
+            _response_cache.move_to_end(key)
+            if len(_response_cache) > HR_CACHE_MAX_ENTRIES:
+                _response_cache.popitem(last=False)
+    finally:
+        # Followers get the complete answer, or None if this call failed or was abandoned
+        if flight is not None:
+            del _HR_IN_FLIGHT[key]
+            done = result is not None and result["success"] and not result.get("partial")
+            flight.set_result(result if done else None)
+
+async def fetch_api(service: str, message: str, email: str = None):
+    """Enhanced API calling with proper error handling - async generator of results
+
+    A text/plain (chunked) reply yields a partial result (``"partial": True``) with the
+    text received so far after every chunk, then the complete one; a JSON reply yields
+    a single result."""
     try:
         config = API_CONFIG[service]
-        url = f"{config['base_url']}{config['endpoint']}"
+        url = config.url
 
         # Prepare payload based on service type
         if service == "timesheet":
@@ -93,23 +237,31 @@ async def call_api(service: str, message: str, email: str = None) -> Dict[str, A
 
         logger.info(f"Calling {service} API: {url}")
 
-        response = requests.post(
-            url,
-            json=payload,
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            },
-            timeout=30
-        )
-
-        if response.status_code == 200:
-            data = response.json()
+        session = get_http_session()
+        # Pre-serialized with orjson; Content-Type comes from the session HEADERS
+        async with session.post(url, data=orjson.dumps(payload)) as response:
+            status = response.status
+            if status == 200 and response.content_type == "text/plain":
+                # Streamed generation - surface each chunk as soon as the server flushes it
+                decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+                parts = []
+                async for raw in response.content.iter_chunked(512):
+                    text = decoder.decode(raw)
+                    if text:
+                        parts.append(text)
+                        yield {"success": True, "message": "".join(parts), "data": {}, "partial": True}
+                logger.info(f"✅ {service} API streamed its response")
+                yield {"success": True, "message": "".join(parts), "data": {}}
+                return
+            body = await response.read()
+
+        if status == 200:
+            data = orjson.loads(body)
             logger.info(f"✅ {service} API responded successfully")
 
             # Handle different response formats
             if service == "timesheet":
-                return {
+                yield {
                     "success": True,
                     "message": data.get("response", data.get("message", "Response received successfully.")),
                     "data": data.get("data", {})
@@ -119,36 +271,36 @@ async def call_api(service: str, message: str, email: str = None) -> Dict[str, A
                 sources = data.get("sources", [])
                 if sources:
                     answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
-                return {
+                yield {
                     "success": True,
                     "message": answer,
                     "data": {"sources": sources}
                 }
         else:
-            logger.error(f"❌ API Error: {response.status_code}")
-            return {
+            logger.error(f"❌ API Error: {status}")
+            yield {
                 "success": False,
-                "message": f"API Error ({response.status_code}): {response.text}",
+                "message": f"API Error ({status}): {body.decode('utf-8', 'replace')}",
                 "data": {}
             }
 
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectorError:
         logger.error(f"❌ Connection error to {service} API")
-        return {
+        yield {
             "success": False,
-            "message": f"🔌 Cannot connect to {config['name']} service. Please ensure the API server is running on {config['base_url']}.",
+            "message": f"🔌 Cannot connect to {config.name} service. Please ensure the API server is running on {config.base_url}.",
             "data": {}
         }
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logger.error(f"❌ Timeout error for {service} API")
-        return {
+        yield {
             "success": False, 
             "message": "⏱️ Request timed out. The server might be busy, please try again.",
             "data": {}
         }
     except Exception as e:
         logger.error(f"❌ Unexpected error: {str(e)}")
-        return {
+        yield {
             "success": False,
             "message": f"❌ An unexpected error occurred: {str(e)}",
             "data": {}
@@ -169,10 +321,13 @@ def format_chat_message(role: str, content: str, timestamp: str = None, service:
     </div>
 </div>"""
     else:
-        service_config = API_CONFIG.get(service, {})
-        service_name = service_config.get("name", "Assistant")
-        service_icon = service_config.get("icon", "🤖")
-        service_color = service_config.get("color", "#7c3aed")
+        service_config = API_CONFIG.get(service)
+        if service_config is not None:
+            service_name = service_config.name
+            service_icon = service_config.icon
+            service_color = service_config.color
+        else:
+            service_name, service_icon, service_color = "Assistant", "🤖", "#7c3aed"
 
         return f"""
 <div style="display: flex; justify-content: flex-start; margin: 15px 0;">
@@ -185,9 +340,28 @@ def format_chat_message(role: str, content: str, timestamp: str = None, service:
     </div>
 </div>"""
 
-def create_service_selection_ui() -> str:
-    """Create beautiful service selection interface"""
-    return f"""
+def build_messages_html(state: ChatState) -> str:
+    """Concatenate the chat bubbles for a conversation
+
+    Messages never change once added, so each is rendered once and appended to
+    state.messages_html; only messages added since the last call are touched."""
+    rendered = state.rendered
+    start = 0 if state.messages_html is None else state.messages_html_count
+    for i, (role, content, timestamp, service, html) in enumerate(
+        islice(zip(state.roles, state.contents, state.timestamps, state.services, rendered), start, None),
+        start
+    ):
+        if html is None:
+            rendered[i] = format_chat_message(role, content, timestamp, service or state.selected_service)
+
+    if state.messages_html is None:
+        state.messages_html = "".join(rendered)
+    else:
+        state.messages_html += "".join(islice(rendered, start, None))
+    state.messages_html_count = len(rendered)
+    return state.messages_html
+
+SERVICE_SELECTION_HTML = """
 <div style="max-width: 600px; margin: 50px auto; text-align: center; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
     <div style="margin-bottom: 40px;">
         <h1 style="font-size: 2.5rem; font-weight: 700; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); -webkit-background-clip: text; -webkit-text-fill-color: transparent; margin-bottom: 8px;">
@@ -232,17 +406,18 @@ def create_service_selection_ui() -> str:
 </div>
 """
 
-def create_chat_header(service: str, email: str) -> str:
-    """Create ChatGPT-style chat header"""
-    config = API_CONFIG[service]
-    return f"""
+def create_service_selection_ui() -> str:
+    """Create beautiful service selection interface"""
+    return SERVICE_SELECTION_HTML
+
+CHAT_HEADER_TEMPLATE = """
 <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 12px 12px 0 0; margin-bottom: 0;">
     <div style="display: flex; align-items: center; justify-content: space-between;">
         <div style="display: flex; align-items: center; gap: 12px;">
-            <div style="font-size: 1.5rem;">{config['icon']}</div>
+            <div style="font-size: 1.5rem;">{icon}</div>
             <div>
-                <h3 style="margin: 0; font-size: 1.25rem; font-weight: 600;">{config['name']}</h3>
-                <p style="margin: 0; opacity: 0.9; font-size: 0.9rem;">{config['description']}</p>
+                <h3 style="margin: 0; font-size: 1.25rem; font-weight: 600;">{name}</h3>
+                <p style="margin: 0; opacity: 0.9; font-size: 0.9rem;">{description}</p>
             </div>
         </div>
         <div style="text-align: right; font-size: 0.85rem; opacity: 0.9;">
@@ -253,7 +428,57 @@ def create_chat_header(service: str, email: str) -> str:
 </div>
 """
 
-def select_service(service: str, email: str, state: ChatState) -> Tuple[gr.update, gr.update, gr.update, gr.update, gr.update, gr.update, ChatState]:
+def create_chat_header(service: str, email: str) -> str:
+    """Create ChatGPT-style chat header"""
+    config = API_CONFIG[service]
+    return CHAT_HEADER_TEMPLATE.format(icon=config.icon, name=config.name, description=config.description, email=email)
+
+TYPING_INDICATOR_TEMPLATE = """
+<div style="display: flex; justify-content: flex-start; margin: 15px 0;">
+    <div style="background: #f0f0f0; padding: 12px 16px; border-radius: 18px 18px 18px 4px; max-width: 80%; border-left: 4px solid {color};">
+        <div style="font-weight: 600; margin-bottom: 8px; color: {color};">
+            {icon} {name}
+        </div>
+        <div style="display: flex; align-items: center; gap: 8px;">
+            <div style="display: flex; gap: 4px;">
+                <div style="width: 8px; height: 8px; border-radius: 50%; background: {color}; animation: bounce 1.4s ease-in-out infinite both; animation-delay: -0.32s;"></div>
+                <div style="width: 8px; height: 8px; border-radius: 50%; background: {color}; animation: bounce 1.4s ease-in-out infinite both; animation-delay: -0.16s;"></div>
+                <div style="width: 8px; height: 8px; border-radius: 50%; background: {color}; animation: bounce 1.4s ease-in-out infinite both;"></div>
+            </div>
+            <span style="color: #666; font-style: italic;">Thinking...</span>
+        </div>
+    </div>
+</div>
+
+<style>
+@keyframes bounce {{
+    0%, 80%, 100% {{ transform: scale(0); }}
+    40% {{ transform: scale(1); }}
+}}
+</style>
+"""
+
+# Only the service varies, so every typing indicator is rendered once up front
+TYPING_INDICATOR_HTML = {
+    service: TYPING_INDICATOR_TEMPLATE.format(color=config.color, icon=config.icon, name=config.name)
+    for service, config in API_CONFIG.items()
+}
+
+WELCOME_MESSAGE_TEMPLATE = """Hello! I'm your {name} assistant. 
+
+{description}
+
+How can I help you today? Feel free to ask me anything related to {name_lower}."""
+
+# Opening message per service, built once
+WELCOME_MESSAGES = {
+    service: WELCOME_MESSAGE_TEMPLATE.format(
+        name=config.name, description=config.description, name_lower=config.name.lower()
+    )
+    for service, config in API_CONFIG.items()
+}
+
+async def select_service(service: str, email: str, state: ChatState) -> Tuple[gr.update, gr.update, gr.update, gr.update, gr.update, gr.update, ChatState]:
     """Handle service selection with ChatGPT-style transition"""
 
     # Validate email
@@ -271,29 +496,21 @@ def select_service(service: str, email: str, state: ChatState) -> Tuple[gr.updat
     # Update state
     state.selected_service = service
     state.user_email = email
-    state.conversation_history = []
+    state.clear_history()
     state.is_initialized = True
     state.message_count = 0
 
     # Get service configuration
     config = API_CONFIG[service]
-    welcome_message = f"""Hello! I'm your {config['name']} assistant. 
-
-{config['description']}
-
-How can I help you today? Feel free to ask me anything related to {config['name'].lower()}."""
+    welcome_message = WELCOME_MESSAGES[service]
 
     # Add welcome message to history
-    state.conversation_history.append({
-        "role": "assistant", 
-        "content": welcome_message,
-        "timestamp": datetime.now().strftime("%I:%M %p"),
-        "service": service
-    })
+    timestamp = datetime.now().strftime("%I:%M %p")
+    welcome_msg_formatted = format_chat_message("assistant", welcome_message, timestamp, service)
+    state.add_message("assistant", welcome_message, timestamp, service, welcome_msg_formatted)
 
     # Create initial chat display
-    chat_header = create_chat_header(service, email)
-    welcome_msg_formatted = format_chat_message("assistant", welcome_message, service=service)
+    chat_header = state.cached_header = create_chat_header(service, email)
 
     chat_html = f"""
 <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
@@ -310,7 +527,7 @@ How can I help you today? Feel free to ask me anything related to {config['name'
         chat_html,                 # chat_display
         gr.update(placeholder="Type your message here... (Press Enter to send)", interactive=True, value=""),  # msg_input
         gr.update(interactive=True),  # send_btn
-        gr.update(value=f"✅ Connected to {config['name']}", visible=True),  # status
+        gr.update(value=f"✅ Connected to {config.name}", visible=True),  # status
         state
     )
 
@@ -335,52 +552,18 @@ async def send_message(message: str, state: ChatState) -> Tuple[str, str, gr.upd
     """
     # Add user message to history
     timestamp = datetime.now().strftime("%I:%M %p")
-    state.conversation_history.append({
-        "role": "user", 
-        "content": message,
-        "timestamp": timestamp
-    })
+    state.add_message("user", message, timestamp)
     state.message_count += 1
 
     # Create updated chat display with user message
     config = API_CONFIG[state.selected_service]
-    chat_header = create_chat_header(state.selected_service, state.user_email)
-
-    # Build conversation HTML
-    messages_html = ""
-    for msg in state.conversation_history:
-        messages_html += format_chat_message(
-            msg["role"], 
-            msg["content"], 
-            msg["timestamp"], 
-            msg.get("service", state.selected_service)
-        )
+    chat_header = state.cached_header
 
-    # Add typing indicator
-    typing_indicator = f"""
-<div style="display: flex; justify-content: flex-start; margin: 15px 0;">
-    <div style="background: #f0f0f0; padding: 12px 16px; border-radius: 18px 18px 18px 4px; max-width: 80%; border-left: 4px solid {config['color']};">
-        <div style="font-weight: 600; margin-bottom: 8px; color: {config['color']};">
-            {config['icon']} {config['name']}
-        </div>
-        <div style="display: flex; align-items: center; gap: 8px;">
-            <div style="display: flex; gap: 4px;">
-                <div style="width: 8px; height: 8px; border-radius: 50%; background: {config['color']}; animation: bounce 1.4s ease-in-out infinite both; animation-delay: -0.32s;"></div>
-                <div style="width: 8px; height: 8px; border-radius: 50%; background: {config['color']}; animation: bounce 1.4s ease-in-out infinite both; animation-delay: -0.16s;"></div>
-                <div style="width: 8px; height: 8px; border-radius: 50%; background: {config['color']}; animation: bounce 1.4s ease-in-out infinite both;"></div>
-            </div>
-            <span style="color: #666; font-style: italic;">Thinking...</span>
-        </div>
-    </div>
-</div>
+    # Only the new user bubble is rendered; built on the event loop so concurrent sends can't interleave
+    messages_html = build_messages_html(state)
 
-<style>
-@keyframes bounce {{
-    0%, 80%, 100% {{ transform: scale(0); }}
-    40% {{ transform: scale(1); }}
-}}
-</style>
-"""
+    # Add typing indicator
+    typing_indicator = TYPING_INDICATOR_HTML[state.selected_service]
 
     chat_with_typing = f"""
 <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
@@ -396,45 +579,46 @@ async def send_message(message: str, state: ChatState) -> Tuple[str, str, gr.upd
     yield (
         chat_with_typing,  # chat_display with typing
         "",                # msg_input (clear)
-        gr.update(value=f"🤔 {config['name']} is thinking...", visible=True),  # status
+        gr.update(value=f"🤔 {config.name} is thinking...", visible=True),  # status
         state
     )
 
-    # Small delay for realistic typing effect
-    await asyncio.sleep(1)
-
     try:
-        # Call API
-        api_result = await call_api(state.selected_service, message, state.user_email)
+        # Call API - a streamed reply is shown while it is still being generated
+        async for api_result in call_api(state.selected_service, message, state.user_email):
+            if api_result.get("partial"):
+                partial_chat = f"""
+<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
+    {chat_header}
+    <div style="background: white; min-height: 400px; padding: 20px; border-radius: 0 0 12px 12px; box-shadow: 0 8px 32px rgba(0,0,0,0.1); max-height: 600px; overflow-y: auto;">
+        {messages_html}
+        {format_chat_message("assistant", api_result["message"], service=state.selected_service)}
+    </div>
+</div>
+"""
+                yield (
+                    partial_chat,  # chat_display
+                    "",            # msg_input (keep clear)
+                    gr.update(value=f"✍️ {config.name} is responding...", visible=True),  # status
+                    state
+                )
 
         if api_result["success"]:
             response = api_result["message"]
-            status_msg = f"✅ Response from {config['name']}"
+            status_msg = f"✅ Response from {config.name}"
         else:
             response = api_result["message"]
-            status_msg = f"⚠️ {config['name']} encountered an issue"
+            status_msg = f"⚠️ {config.name} encountered an issue"
 
     except Exception as e:
         response = f"I apologize, but I encountered an unexpected error: {str(e)}\n\nPlease try again or contact support if the issue persists."
-        status_msg = f"❌ Error communicating with {config['name']}"
+        status_msg = f"❌ Error communicating with {config.name}"
 
     # Add assistant response to history
-    state.conversation_history.append({
-        "role": "assistant",
-        "content": response, 
-        "timestamp": datetime.now().strftime("%I:%M %p"),
-        "service": state.selected_service
-    })
+    state.add_message("assistant", response, datetime.now().strftime("%I:%M %p"), state.selected_service)
 
     # Create final chat display without typing indicator
-    final_messages_html = ""
-    for msg in state.conversation_history:
-        final_messages_html += format_chat_message(
-            msg["role"],
-            msg["content"], 
-            msg["timestamp"],
-            msg.get("service", state.selected_service)
-        )
+    final_messages_html = build_messages_html(state)
 
     final_chat = f"""
 <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;">
@@ -630,13 +814,13 @@ def create_chatgpt_interface():
 
         # Event handlers with async support
         timesheet_btn.click(
-            fn=lambda email, state: select_service("timesheet", email, state),
+            fn=partial(select_service, "timesheet"),
             inputs=[email_input, state],
             outputs=[welcome_screen, chat_interface, chat_display, msg_input, send_btn, status_display, state]
         )
 
         hr_policy_btn.click(
-            fn=lambda email, state: select_service("hr_policy", email, state),
+            fn=partial(select_service, "hr_policy"),
             inputs=[email_input, state], 
             outputs=[welcome_screen, chat_interface, chat_display, msg_input, send_btn, status_display, state]
         )
@@ -683,6 +867,9 @@ if __name__ == "__main__":
     # Create and launch the app
     app = create_chatgpt_interface()
 
+    # Handlers are coroutines, so concurrency is bounded by the queue rather than a worker thread pool
+    app.queue(default_concurrency_limit=64, max_size=200)
+
     app.launch(
         server_name="0.0.0.0",
         server_port=7860,
@@ -692,6 +879,5 @@ if __name__ == "__main__":
         debug=False,
         inbrowser=True,
         favicon_path=None,
-        auth=None,
-        max_threads=10
+        auth=None
     )
@@ -4,12 +4,21 @@
 """
 
 import gradio as gr
-import requests
-import json
+import aiohttp
+import orjson
 import asyncio
+import atexit
+import codecs
+import html
+import os
+import re
+import threading
 import time
+import uuid
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, Any
+from functools import partial
+from typing import Dict, Any, Optional, Tuple
 import logging
 
 # Configure logging
@@ -38,114 +47,514 @@ API_CONFIG = {
     }
 }
 
+# Full endpoint URL per service, joined once instead of on every request
+for _config in API_CONFIG.values():
+    _config["url"] = f"{_config['base_url']}{_config['endpoint']}"
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json"
+}
+
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use inside Gradio's event loop"""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            # Pooled keep-alive sockets to both backends instead of a new connection per message
+            connector=aiohttp.TCPConnector(limit=200, limit_per_host=100, keepalive_timeout=60),
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+    return _SESSION
+
+def close_http_session():
+    """Close the shared aiohttp session on interpreter shutdown"""
+    if _SESSION is not None and not _SESSION.closed:
+        try:
+            asyncio.run(_SESSION.close())
+        except Exception:
+            pass
+
+atexit.register(close_http_session)
+
+_POOL_WARMED = False
+
+async def warm_up_connections():
+    """Hit each backend's /health (concurrently) so the pool holds a live socket and the backend is warm"""
+    global _POOL_WARMED
+    if _POOL_WARMED:
+        return
+    _POOL_WARMED = True
+    session = get_http_session()
+
+    async def touch(base_url: str):
+        # Any status will do - the point is the pooled socket
+        async with session.get(f"{base_url}/health"):
+            pass
+
+    await asyncio.gather(
+        *(touch(config["base_url"]) for config in API_CONFIG.values()),
+        return_exceptions=True
+    )
+
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+HR_CACHE_TTL_SECONDS = 3600
+HR_CACHE_MAX_ENTRIES = 512
+
+# (service, normalized question, email domain) -> (stored at, answer); oldest first
+_answer_cache: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+
+# HR questions currently being fetched; identical questions share that request instead of a second POST
+_HR_IN_FLIGHT: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+async def call_api(service: str, message: str, email: str):
+    """Cached front for fetch_api - yields (ok, reply so far) like it, ending with the full reply
+
+    HR policy answers come from static documents and are reused; timesheet replies
+    depend on the user's live data and always go to the backend."""
+    if service != "hr_policy":
+        async for result in fetch_api(service, message, email):
+            yield result
+        return
+
+    key = (service, " ".join(message.lower().split()), email.rpartition("@")[2])
+    cached = _answer_cache.get(key)
+    if cached is not None:
+        stored_at, answer = cached
+        if time.monotonic() - stored_at < HR_CACHE_TTL_SECONDS:
+            _answer_cache.move_to_end(key)
+            yield True, answer
+            return
+        del _answer_cache[key]
+
+    leader = _HR_IN_FLIGHT.get(key)
+    if leader is not None:
+        ok, answer = await asyncio.shield(leader)
+        if ok:
+            yield True, answer
+            return
+        # The leader failed - make our own call below
+
+    flight = None
+    if leader is None:
+        flight = _HR_IN_FLIGHT[key] = asyncio.get_running_loop().create_future()
+    ok, answer, complete = False, "", False
+    try:
+        async for ok, answer in fetch_api(service, message, email):
+            yield ok, answer
+        complete = True
+        if ok:
+            _answer_cache[key] = (time.monotonic(), answer)
+            if len(_answer_cache) > HR_CACHE_MAX_ENTRIES:
+                _answer_cache.popitem(last=False)
+    finally:
+        # Followers only ever get a finished answer, never a partial one
+        if flight is not None:
+            del _HR_IN_FLIGHT[key]
+            flight.set_result((ok and complete, answer))
+
+async def fetch_api(service: str, message: str, email: str):
+    """Ask the selected backend - yields (True, reply so far) or (False, a readable error)
+
+    A text/plain (chunked) reply yields after every chunk as it arrives; a JSON reply
+    yields once."""
+    config = API_CONFIG[service]
+    url = config["url"]
+
+    if service == "timesheet":
+        payload = {"email": email, "user_prompt": message}
+    else:  # hr_policy
+        payload = {"question": message}
+
+    try:
+        session = get_http_session()
+        # Content-Type comes from the session HEADERS
+        async with session.post(url, data=orjson.dumps(payload)) as response:
+            if response.status != 200:
+                logger.error(f"❌ API Error: {response.status}")
+                yield False, f"API Error ({response.status}): {await response.text()}"
+                return
+            if response.content_type == "text/plain":
+                # Streamed generation - pass each chunk on as soon as the server flushes it
+                decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+                parts = []
+                async for raw in response.content.iter_any():
+                    text = decoder.decode(raw)
+                    if text:
+                        parts.append(text)
+                        yield True, "".join(parts)
+                if not parts:
+                    yield True, ""
+                return
+            data = orjson.loads(await response.read())
+
+        if service == "timesheet":
+            yield True, data.get("response", data.get("message", "Response received successfully."))
+            return
+        answer = data.get("answer", data.get("response", data.get("message", "Response received successfully.")))
+        sources = data.get("sources", [])
+        if sources:
+            answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
+        yield True, answer
+
+    except aiohttp.ClientConnectorError:
+        logger.error(f"❌ Connection error to {service} API")
+        yield False, f"🔌 Cannot connect to {config['name']} service. Please ensure the API server is running on {config['base_url']}."
+    except asyncio.TimeoutError:
+        logger.error(f"❌ Timeout error for {service} API")
+        yield False, "⏱️ Request timed out. The server might be busy, please try again."
+    except Exception as e:
+        logger.error(f"❌ Unexpected error: {str(e)}")
+        yield False, f"❌ An unexpected error occurred: {str(e)}"
+
+async def query_all(message: str, email: str) -> Dict[str, str]:
+    """Ask every backend at once - total wait is the slowest reply, not the sum"""
+    async def final_reply(service: str) -> str:
+        reply = ""
+        async for _, reply in call_api(service, message, email):
+            pass
+        return reply
+
+    services = list(API_CONFIG)
+    results = await asyncio.gather(
+        *(final_reply(service) for service in services),
+        return_exceptions=True
+    )
+    # gather keeps input order; a failure in one service never hides the other's answer
+    return {
+        service: f"❌ An unexpected error occurred: {result}" if isinstance(result, BaseException) else result
+        for service, result in zip(services, results)
+    }
+
+# Message timestamps only show the minute, so format once per minute
+_TIME_LABEL_CACHE = [-1, ""]
+
+def current_time_label() -> str:
+    """Return the current time as e.g. '02:35 PM', reformatted only when the minute changes"""
+    minute = int(time.time()) // 60
+    if minute != _TIME_LABEL_CACHE[0]:
+        _TIME_LABEL_CACHE[0] = minute
+        _TIME_LABEL_CACHE[1] = datetime.now().strftime("%I:%M %p")
+    return _TIME_LABEL_CACHE[1]
+
+# Oldest messages drop off past this point so a long session stays a fixed size
+MAX_HISTORY_MESSAGES = 200
+
 class ChatState:
     def __init__(self):
         self.selected_service = None
+        self.service_config = None  # API_CONFIG entry of selected_service
         self.user_email = ""
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.chat_messages = []  # Chatbot view of conversation_history, kept in step by add_message
+        self.pending_question = None  # Asked before setup finished; answered once it does
+        self.confirmed_both = None  # Message the user agreed to send to every service
         self.is_initialized = True  # Start initialized with welcome msg
         self.session_start = datetime.now()
         self.message_count = 0
 
     def reset(self):
         self.selected_service = None
+        self.service_config = None
         self.user_email = ""
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.chat_messages = []
+        self.pending_question = None
+        self.confirmed_both = None
         self.is_initialized = True
         self.session_start = datetime.now()
         self.message_count = 0
 
-# Initial assistant welcome message inside chat
-def initial_welcome_message():
-    msg = """
+    @property
+    def is_ready(self) -> bool:
+        return self.selected_service is not None and bool(self.user_email)
+
+    def add_message(self, message: Dict[str, Any]) -> Dict[str, str]:
+        """Append a message to the history and the Chatbot view, dropping the oldest once full
+
+        Returns the Chatbot row, so a streamed reply can be grown in place."""
+        if len(self.conversation_history) == MAX_HISTORY_MESSAGES:
+            del self.chat_messages[0]
+        self.conversation_history.append(message)
+        content = message["content"]
+        if message["role"] == "user":
+            # Escaped once here so whatever the user typed shows as text, never as markup
+            content = html.escape(content)
+        row = {"role": message["role"], "content": content}
+        self.chat_messages.append(row)
+        return row
+
+WELCOME_MESSAGE = """
 👋 Hello! Welcome to the Enterprise Assistant.  
-Please choose a service to get started:
+Please choose a service with the buttons below to get started:
 
 - ⏰ **Timesheet Management** – Manage Oracle and Mars timesheets  
 - 📋 **HR Policy Assistant** – Ask questions about policies and HR docs  
 
 Please also provide your 📧 email address before starting.
 """
+
+# Chat bubble look lives here once, not inline in every message
+CUSTOM_CSS = """
+.gradio-container { max-width: 900px; margin: auto; }
+.chat-display .message.user { background: linear-gradient(135deg, #0066cc, #004499); color: white; border-radius: 18px 18px 4px 18px; }
+.chat-display .message.bot { background: #f8f9fa; color: #333; border-radius: 18px 18px 18px 4px; border-left: 4px solid #7c3aed; }
+"""
+
+# Initial assistant welcome message inside chat
+def initial_welcome_message():
     return {
         "role": "assistant",
-        "content": msg,
-        "timestamp": datetime.now().strftime("%I:%M %p"),
+        "content": WELCOME_MESSAGE,
+        "timestamp": current_time_label(),
         "service": None
     }
 
-def format_chat_message(role: str, content: str, timestamp: str = None, service: str = None) -> str:
-    if timestamp is None:
-        timestamp = datetime.now().strftime("%I:%M %p")
-
-    if role == "user":
-        return f"""
-<div style="display: flex; justify-content: flex-end; margin: 15px 0;">
-    <div style="background: linear-gradient(135deg, #0066cc, #004499); color: white; padding: 12px 16px; border-radius: 18px 18px 4px 18px; max-width: 80%;">
-        <div style="font-weight: 500; margin-bottom: 4px;">You</div>
-        <div style="line-height: 1.5;">{content}</div>
-        <div style="font-size: 11px; opacity: 0.8; margin-top: 8px; text-align: right;">{timestamp}</div>
-    </div>
-</div>"""
-    else:
-        return f"""
-<div style="display: flex; justify-content: flex-start; margin: 15px 0;">
-    <div style="background: #f8f9fa; color: #333; padding: 12px 16px; border-radius: 18px 18px 18px 4px; max-width: 80%; border-left: 4px solid #7c3aed;">
-        <div style="font-weight: 600; margin-bottom: 8px; color: #7c3aed;">
-            🤖 Assistant
-        </div>
-        <div style="line-height: 1.6; white-space: pre-wrap;">{content}</div>
-        <div style="font-size: 11px; color: #666; margin-top: 8px;">{timestamp}</div>
-    </div>
-</div>"""
-
-# Render chat history
+# Sessions idle longer than this are dropped; the browser gets a fresh one on reload
+SESSION_IDLE_SECONDS = 4 * 3600
+MAX_SESSIONS = 1000
+
+# Server-side chat sessions keyed by the id held in gr.State, least recently used first
+_SESSIONS: "OrderedDict[str, ChatState]" = OrderedDict()
+_SESSION_LAST_USED: Dict[str, float] = {}
+_SESSIONS_LOCK = threading.Lock()  # reset_conversation runs on Gradio's worker threads
+
+def new_session_id() -> str:
+    """Create a fresh session id for a browser session"""
+    return str(uuid.uuid4())
+
+def get_chat_state(session_id: str) -> ChatState:
+    """Return the ChatState for a session, creating it (and sweeping idle sessions) as needed"""
+    now = time.monotonic()
+    with _SESSIONS_LOCK:
+        state = _SESSIONS.get(session_id)
+        if state is None:
+            # Least recently used first, so idle sessions are all at the front
+            while _SESSIONS:
+                oldest = next(iter(_SESSIONS))
+                if len(_SESSIONS) < MAX_SESSIONS and now - _SESSION_LAST_USED[oldest] < SESSION_IDLE_SECONDS:
+                    break
+                del _SESSIONS[oldest], _SESSION_LAST_USED[oldest]
+            state = _SESSIONS[session_id] = ChatState()
+            state.add_message(initial_welcome_message())
+        else:
+            _SESSIONS.move_to_end(session_id)
+        _SESSION_LAST_USED[session_id] = now
+        return state
+
+# Chatbot messages for the conversation - built as messages are added, nothing to format here
 def render_chat(state: ChatState):
-    return "".join([
-        format_chat_message(m["role"], m["content"], m["timestamp"]) for m in state.conversation_history
-    ])
+    return state.chat_messages
+
+def setup_prompt(state: ChatState) -> str:
+    """What the user still has to provide before questions can be answered"""
+    if state.selected_service is None:
+        return "Which service would you like? Pick ⏰ **Timesheet Management** or 📋 **HR Policy Assistant** below."
+    return "Please provide your 📧 email address to continue."
+
+async def stream_reply(state: ChatState, question: str):
+    """Ask the selected service and grow its answer in the chat - yields the status line after each step"""
+    config = state.service_config
+    # Show the question straight away while the backend works
+    yield f"🤔 {config['name']} is thinking..."
+    entry = row = None
+    ok = False
+    async for ok, reply in call_api(state.selected_service, question, state.user_email):
+        if entry is None:
+            entry = {
+                "role": "assistant",
+                "content": reply,
+                "timestamp": current_time_label(),
+                "service": state.selected_service
+            }
+            row = state.add_message(entry)
+        else:
+            # Grow the reply in place - other handlers may have added rows after it meanwhile
+            entry["content"] = row["content"] = reply
+        yield f"✍️ {config['name']} is responding..."
+    state.message_count += 1
+    if ok:
+        yield f"✅ Response from {config['name']}"
+    else:
+        yield f"⚠️ {config['name']} encountered an issue"
+
+async def select_service(service: str, session_id: str):
+    """Switch the session to a service, then answer any question asked during setup"""
+    state = get_chat_state(session_id)
+    state.selected_service = service
+    state.service_config = config = API_CONFIG[service]
+    if state.user_email:
+        reply = f"{config['icon']} {config['name']} selected for {state.user_email}. How can I help you today?"
+    else:
+        reply = f"{config['icon']} {config['name']} selected. {setup_prompt(state)}"
+    state.add_message({
+        "role": "assistant",
+        "content": reply,
+        "timestamp": current_time_label(),
+        "service": service
+    })
+    # The message box is left alone - the user may be typing
+    yield render_chat(state), gr.update(), gr.update(value=f"{config['icon']} {config['name']} selected", visible=True)
+
+    if state.is_ready and state.pending_question:
+        question, state.pending_question = state.pending_question, None
+        async for status in stream_reply(state, question):
+            yield render_chat(state), gr.update(), gr.update(value=status, visible=True)
 
 # Reset conversation
-def reset_conversation(state: ChatState):
+def reset_conversation(session_id: str):
+    state = get_chat_state(session_id)
     state.reset()
-    state.conversation_history.append(initial_welcome_message())
+    state.add_message(initial_welcome_message())
     return (
         render_chat(state),
         "",
-        gr.update(value="Welcome! Please select Timesheet or HR Policy to continue.", visible=True),
-        state
+        gr.update(value="Welcome! Please select Timesheet or HR Policy to continue.", visible=True)
     )
 
 # Gradio UI
 def create_chatgpt_interface():
-    custom_css = ".gradio-container { max-width: 900px; margin: auto; }"
-
-    with gr.Blocks(css=custom_css) as app:
-        state = gr.State(ChatState())
-        state.value.conversation_history.append(initial_welcome_message())
+    with gr.Blocks(css=CUSTOM_CSS) as app:
+        # Only the session id round-trips; the ChatState lives server-side in _SESSIONS
+        session_id = gr.State(new_session_id)
 
         # Initialize with welcome message
-        chat_display = gr.HTML(render_chat(state.value))
+        welcome_state = ChatState()
+        welcome_state.add_message(initial_welcome_message())
+        chat_display = gr.Chatbot(render_chat(welcome_state), type="messages", render_markdown=True, show_label=False, elem_classes=["chat-display"])
+        with gr.Row():
+            timesheet_btn = gr.Button(f"{API_CONFIG['timesheet']['icon']} {API_CONFIG['timesheet']['name']}")
+            hr_policy_btn = gr.Button(f"{API_CONFIG['hr_policy']['icon']} {API_CONFIG['hr_policy']['name']}")
         msg_input = gr.Textbox(label="Your Message", placeholder="Type here...", lines=2)
         send_btn = gr.Button("Send 🚀")
+        ask_both_btn = gr.Button("🔀 Ask Both Services")
         reset_btn = gr.Button("❌ New Conversation")
         status_display = gr.Markdown("Welcome! Please select Timesheet or HR Policy.")
 
-        def on_send(message, state: ChatState):
+        async def on_send(message, session_id: str):
+            state = get_chat_state(session_id)
             if not message.strip():
-                return render_chat(state), "", gr.update(value="Please enter a message", visible=True), state
-            state.conversation_history.append({
+                yield render_chat(state), "", gr.update(value="Please enter a message", visible=True)
+                return
+            state.add_message({
                 "role": "user",
                 "content": message,
-                "timestamp": datetime.now().strftime("%I:%M %p")
+                "timestamp": current_time_label()
             })
-            return render_chat(state), "", gr.update(value="Message sent", visible=True), state
 
-        send_btn.click(on_send, [msg_input, state], [chat_display, msg_input, status_display, state])
-        msg_input.submit(on_send, [msg_input, state], [chat_display, msg_input, status_display, state])
-        reset_btn.click(reset_conversation, [state], [chat_display, msg_input, status_display, state])
+            question = message
+            if not state.is_ready:
+                # Still setting up - take the email from the message and keep the rest as the first question
+                email_match = EMAIL_PATTERN.search(message)
+                if email_match:
+                    state.user_email = email_match.group(0)
+                    question = EMAIL_PATTERN.sub("", message).strip()
+                if question:
+                    state.pending_question = question
+
+                if not state.is_ready:
+                    state.add_message({
+                        "role": "assistant",
+                        "content": setup_prompt(state),
+                        "timestamp": current_time_label(),
+                        "service": state.selected_service
+                    })
+                    yield render_chat(state), "", gr.update(value="Setting up your session", visible=True)
+                    return
+
+                config = state.service_config
+                question, state.pending_question = state.pending_question, None
+                if not question:
+                    state.add_message({
+                        "role": "assistant",
+                        "content": f"{config['icon']} {config['name']} selected for {state.user_email}. How can I help you today?",
+                        "timestamp": current_time_label(),
+                        "service": state.selected_service
+                    })
+                    yield render_chat(state), "", gr.update(value=f"{config['icon']} {config['name']} ready", visible=True)
+                    return
+
+            async for status in stream_reply(state, question):
+                yield render_chat(state), "", gr.update(value=status, visible=True)
+
+        async def on_send_both(message, session_id: str):
+            state = get_chat_state(session_id)
+            if not message.strip():
+                yield render_chat(state), "", gr.update(value="Please enter a message", visible=True)
+                return
+            if state.confirmed_both != message:
+                # Timesheet /chat is the user's own stateful conversation and can change entries - ask first
+                state.confirmed_both = message
+                yield render_chat(state), message, gr.update(
+                    value=f"⚠️ This also sends your message to {API_CONFIG['timesheet']['name']}, which keeps it in your timesheet conversation. Click Ask Both again to confirm.",
+                    visible=True
+                )
+                return
+            # One confirmation covers one send
+            state.confirmed_both = None
+            state.add_message({
+                "role": "user",
+                "content": message,
+                "timestamp": current_time_label()
+            })
+
+            email_match = EMAIL_PATTERN.search(message)
+            if email_match:
+                state.user_email = email_match.group(0)
+            if not state.user_email:
+                # Timesheet needs to know who is asking
+                state.add_message({
+                    "role": "assistant",
+                    "content": "Please provide your 📧 email address to continue.",
+                    "timestamp": current_time_label(),
+                    "service": None
+                })
+                yield render_chat(state), "", gr.update(value="Setting up your session", visible=True)
+                return
+
+            yield render_chat(state), "", gr.update(value="🤔 Asking both services...", visible=True)
+            replies = await query_all(message, state.user_email)
+            timestamp = current_time_label()
+            for service, reply in replies.items():
+                config = API_CONFIG[service]
+                state.add_message({
+                    "role": "assistant",
+                    "content": f"{config['icon']} **{config['name']}**\n\n{reply}",
+                    "timestamp": timestamp,
+                    "service": service
+                })
+            state.message_count += 1
+            yield render_chat(state), "", gr.update(value="✅ Responses from both services", visible=True)
+
+        # Service buttons can be used at any time to switch service
+        timesheet_btn.click(partial(select_service, "timesheet"), [session_id], [chat_display, msg_input, status_display])
+        hr_policy_btn.click(partial(select_service, "hr_policy"), [session_id], [chat_display, msg_input, status_display])
+        send_btn.click(on_send, [msg_input, session_id], [chat_display, msg_input, status_display])
+        msg_input.submit(on_send, [msg_input, session_id], [chat_display, msg_input, status_display])
+        ask_both_btn.click(on_send_both, [msg_input, session_id], [chat_display, msg_input, status_display])
+        reset_btn.click(reset_conversation, [session_id], [chat_display, msg_input, status_display])
+
+        # Runs on the first page load, inside Gradio's event loop where the shared session must live
+        app.load(fn=warm_up_connections, inputs=None, outputs=None, api_name=False)
 
     return app
 
 if __name__ == "__main__":
+    # Faster libuv-backed event loop when available (winloop is the Windows build)
+    try:
+        if os.name == "nt":
+            import winloop as uvloop
+        else:
+            import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
     app = create_chatgpt_interface()
+    # Handlers mostly wait on the backends, so let plenty of them overlap on the event loop
+    app.queue(default_concurrency_limit=32, max_size=256)
     app.launch(server_name="0.0.0.0", server_port=7860, inbrowser=True)
\ No newline at end of file